@@ -0,0 +1,28 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_path(path):
+    """
+    Liefert einen eindeutigen temporären Pfad im Verzeichnis von `path`.
+
+    Nach erfolgreichem Schreiben ersetzt die temporäre Datei `path` atomar, bei
+    einem Fehler wird sie entfernt. Da der Name per mkstemp vergeben wird, kommen
+    sich auch mehrere Threads eines Prozesses (Seite und Hintergrund-Ingest) nicht
+    in die Quere.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f'{os.path.basename(path)}.', suffix='.tmp', dir=directory)
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
@@ -0,0 +1,87 @@
+import logging
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+import xml_cache
+from config import get_secrets
+from vplan_data import load_schuljahre
+
+# Höchstens so viele Tage pro Ingest-Lauf abrufen; der Rest folgt im nächsten Lauf
+MAX_DAYS_PER_RUN = 60
+
+
+def parse_holidays(entries):
+    """
+    Ferien und Feiertage aus der Konfiguration als Menge von Tagen.
+
+    Einträge sind einzelne Tage ('2024-10-03') oder Zeiträume
+    ('2024-10-21/2024-11-01', beide Tage eingeschlossen).
+    """
+    holidays = set()
+    for entry in entries:
+        start, _, end = str(entry).partition('/')
+        start = date.fromisoformat(start.strip())
+        end = date.fromisoformat(end.strip()) if end else start
+        holidays.update(pd.date_range(start, end, freq='D').date)
+    return holidays
+
+
+def school_days(schuljahre, holidays=()):
+    """
+    Schultage laut Tabellenblatt 'schuljahr': alle Wochentage von Montag der
+    Startwoche bis Freitag der Endwoche jedes Schuljahres, ohne `holidays`.
+    """
+    days = set()
+    for row in schuljahre.to_dict('records'):
+        start = date.fromisocalendar(int(row['Jahr-Start']), int(row['KW-Start']), 1)
+        end = date.fromisocalendar(int(row['Jahr-Ende']), int(row['KW-Ende']), 5)
+        days.update(pd.bdate_range(start, end).date)
+    return days - set(holidays)
+
+
+def load_school_calendar():
+    """
+    Schulkalender aus dem Tabellenblatt 'schuljahr' und den konfigurierten Ferien
+    (leer, wenn keine Vergleichstabelle konfiguriert ist).
+
+    Konfiguration in den Secrets (optional):
+        [calendar]
+        holidays = ["2024-10-03", "2024-10-21/2024-11-01"]
+    """
+    secrets = get_secrets()
+    if "vergleich-sollstunden" not in secrets.get("connections", {}).get("gsheets", {}):
+        return set()
+    holidays = parse_holidays(secrets.get("calendar", {}).get("holidays", []))
+    return school_days(load_schuljahre(), holidays)
+
+
+def _nothing_to_fetch(day):
+    # Nach Ende des Tages festgestellte Ergebnisse bleiben endgültig: ein 404 (z. B. ein
+    # nicht konfigurierter Feiertag) oder ein verarbeiteter Plan ohne Einträge, zu dem
+    # daher keine Tagesdatei im Speicher existiert; solche Tage nicht erneut abrufen
+    entry = xml_cache.lookup(day.strftime('%Y%m%d'))
+    if entry is None:
+        return False
+    if entry.get('status') == 'ok' and not xml_cache.is_processed(entry):
+        return False
+    day_end = datetime.combine(day + timedelta(days=1), datetime.min.time())
+    return entry.get('checked_at', 0) >= day_end.timestamp()
+
+
+def plan_backfill(calendar, stored, heute=None):
+    """
+    Fehlende Schultage vor `heute`: im Kalender, aber nicht in `stored` und auch nicht
+    bereits endgültig ohne Einträge abgerufen.
+
+    Rückgabe:
+    - Liste von Tagen (YYYYMMDD), die jüngsten zuerst, damit die aktuellen
+      Daten vor älteren Lücken nachgeladen werden.
+    """
+    heute = heute or date.today()
+    missing = sorted((day for day in calendar
+                      if day < heute and day not in stored and not _nothing_to_fetch(day)),
+                     reverse=True)
+    if missing:
+        logging.info(f'Backfill: {len(missing)} fehlende Schultage, ältester {missing[-1].isoformat()}.')
+    return [day.strftime('%Y%m%d') for day in missing]
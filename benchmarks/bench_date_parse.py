@@ -0,0 +1,55 @@
+"""
+Benchmark für das Parsen der Vertretungsplan-Titel ("Montag, 25. November 2024").
+
+Misst die Importzeit (Kaltstart in einem frischen Interpreter) sowie die Zeit pro
+Aufruf von dateparser und german_date.parse_german_date und prüft, dass beide
+für alle Monate dasselbe Datum liefern.
+
+Aufruf aus dem Projektverzeichnis:
+    python benchmarks/bench_date_parse.py
+"""
+import os
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MONATE = ['Januar', 'Februar', 'März', 'April', 'Mai', 'Juni', 'Juli',
+          'August', 'September', 'Oktober', 'November', 'Dezember']
+SAMPLES = [f'{tag}. {monat} 2024' for monat in MONATE for tag in (1, 15, 28)]
+
+
+def import_time(module, repeat=3):
+    """Minimale Importzeit eines Moduls in einem frischen Interpreter (Sekunden)."""
+    code = f'import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)'
+    timings = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+        timings.append(float(out.stdout.strip()))
+    return min(timings)
+
+
+def main(number=200):
+    import dateparser
+    from german_date import parse_german_date
+
+    for sample in SAMPLES:
+        expected = dateparser.parse(sample, languages=['de'])
+        assert parse_german_date(sample) == expected, sample
+    print(f'{len(SAMPLES)} Titel-Daten geprüft, Ergebnisse identisch')
+
+    print(f'Import dateparser:          {import_time("dateparser") * 1000:8.1f} ms')
+    print(f'Import german_date:         {import_time("german_date") * 1000:8.1f} ms')
+
+    t_dateparser = min(timeit.repeat(
+        lambda: [dateparser.parse(s, languages=['de']) for s in SAMPLES], number=number, repeat=3))
+    t_fast = min(timeit.repeat(lambda: [parse_german_date(s) for s in SAMPLES], number=number, repeat=3))
+    calls = number * len(SAMPLES)
+    print(f'dateparser.parse:           {t_dateparser / calls * 1e6:8.1f} µs/Aufruf')
+    print(f'parse_german_date:          {t_fast / calls * 1e6:8.1f} µs/Aufruf')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark für die Filter der Seite "Daten Vertretungsplan" auf dem synthetischen Schuljahr.
+
+Vergleicht vplan_filter.VertretungsplanFilter mit den früheren booleschen Masken
+über die ganze Tabelle (filter_data) und prüft, dass beide dieselben Datensätze liefern.
+
+Aufruf aus dem Projektverzeichnis:
+    python benchmarks/bench_filter.py
+"""
+import os
+import sys
+import timeit
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_year import make_vertretungsplan  # noqa: E402
+from schema import apply_vertretungsplan_schema  # noqa: E402
+from vplan_filter import KEINE_KLASSENSTUFE, VertretungsplanFilter  # noqa: E402
+
+
+def filter_data_legacy(df, start_date, end_date, selected_klassen,
+                       selected_ausfall, selected_selbststudium, selected_ausfall_fach, selected_klassenstufen):
+    """Frühere Implementierung: Masken über alle Zeilen."""
+    filtered_df = df[
+        (df['Datum'] >= pd.to_datetime(start_date)) &
+        (df['Datum'] <= pd.to_datetime(end_date)) &
+        (df['Klasse'].isin(selected_klassen)) &
+        (df['Klassenstufe'].isin([k for k in selected_klassenstufen if k != KEINE_KLASSENSTUFE]) |
+         (df['Klassenstufe'].isna() & (KEINE_KLASSENSTUFE in selected_klassenstufen)))
+    ]
+    if selected_ausfall != 'Alle':
+        filtered_df = filtered_df[filtered_df['Ausfall'] == (selected_ausfall == 'Ja')]
+    if selected_selbststudium != 'Alle':
+        filtered_df = filtered_df[filtered_df['Selbststudium'] == (selected_selbststudium == 'Ja')]
+    if selected_ausfall_fach:
+        filtered_df = filtered_df[
+            filtered_df['Ausfall-Fach'].astype(object).fillna('Kein Fach').replace('', 'Kein Fach').isin(selected_ausfall_fach)
+        ]
+    return filtered_df
+
+
+def main(number=20):
+    # Zufällige Zeilenreihenfolge wie nach mehreren Updates
+    df = apply_vertretungsplan_schema(make_vertretungsplan().sample(frac=1, random_state=0))
+    t_build = timeit.timeit(lambda: VertretungsplanFilter(df), number=1)
+    engine = VertretungsplanFilter(df)
+    print(f'{len(df)} Datensätze, Aufbau der Filter-Engine: {t_build * 1000:.1f} ms')
+
+    tage = sorted(engine.df['Datum'].dt.date.unique())
+    szenarien = {
+        'alles': (tage[0], tage[-1], engine.klassen(), 'Alle', 'Alle',
+                  engine.ausfall_faecher(), engine.klassenstufen()),
+        'eine Woche, 10 Klassen, Ausfall': (tage[100], tage[104], engine.klassen()[:10], 'Ja', 'Alle',
+                                            engine.ausfall_faecher(), engine.klassenstufen()),
+        'ein Tag, Fach MA': (tage[50], tage[50], engine.klassen(), 'Alle', 'Alle',
+                             ['MA'], engine.klassenstufen()),
+    }
+    for name, args in szenarien.items():
+        expected = filter_data_legacy(df, *args).sort_index()
+        result = engine.filter(*args)
+        pd.testing.assert_frame_equal(result.sort_index(), expected)
+        t_legacy = min(timeit.repeat(lambda: filter_data_legacy(df, *args), number=number, repeat=3)) / number
+        t_engine = min(timeit.repeat(lambda: engine.filter(*args), number=number, repeat=3)) / number
+        print(f'{name:34s} {len(result):6d} Treffer  '
+              f'Masken: {t_legacy * 1000:7.2f} ms  Engine: {t_engine * 1000:7.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark für calculate_ist_delta auf einem synthetischen Schuljahr
+(≈200 Tage × 60 Klassen × 8 Stunden, siehe synthetic_year.py).
+
+Vergleicht die Aggregation mit kategorialen Schlüsseln und eingebauten
+Reduktionen mit der früheren Implementierung (groupby-apply mit Lambda) und
+prüft, dass beide dasselbe Ergebnis liefern.
+
+Aufruf aus dem Projektverzeichnis:
+    python benchmarks/bench_ist_delta.py
+"""
+import os
+import sys
+import timeit
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_year import SCHULJAHR, make_vergleich, make_vertretungsplan  # noqa: E402
+from vergleich import calculate_ist_delta  # noqa: E402
+
+
+def calculate_ist_delta_legacy(vergleich_df, vp_df, schuljahr):
+    """Frühere Implementierung mit groupby-apply und Lambda pro Gruppe."""
+    vp_df = vp_df.drop_duplicates(subset=['ID'], keep='first')
+    vergleich_df['Schuljahr'] = vergleich_df['Schuljahr'].astype(str)
+    vp_df['Schuljahr'] = schuljahr
+    vergleich_df['Klassenstufe'] = pd.to_numeric(vergleich_df['Klassenstufe'], errors='coerce').astype('Int64', errors='ignore')
+    vp_df['Klassenstufe'] = pd.to_numeric(vp_df['Klassenstufe'], errors='coerce').astype('Int64', errors='ignore')
+    vergleich_df['Ausfall-Fach'] = vergleich_df['Fach'].astype(str).str.strip()
+    vergleich_df['Klasse'] = vergleich_df['Klasse'].astype(str).str.strip()
+    vp_df['Ausfall-Fach'] = vp_df['Ausfall-Fach'].astype(str).str.strip()
+    vp_df['Klasse'] = vp_df['Klasse'].astype(str).str.strip()
+    iso_cal = vp_df['Datum'].dt.isocalendar()
+    vp_df['Jahr'] = iso_cal['year']
+    vp_df['KW'] = iso_cal['week']
+    df_dates = vp_df[['Jahr', 'KW']].dropna().drop_duplicates().astype(int).sort_values(by=['Jahr', 'KW'])
+    if df_dates.empty:
+        vergleich_df['Ist'] = vergleich_df['Soll']
+        vergleich_df['Delta'] = 0
+        return vergleich_df
+    min_jahr = df_dates.iloc[0]['Jahr']
+    min_kw = df_dates.iloc[0]['KW']
+    vergleich_df = vergleich_df[((vergleich_df['Jahr'] > min_jahr) | ((vergleich_df['Jahr'] == min_jahr) & (vergleich_df['KW'] >= min_kw)))]
+    grp_cols = ['Schuljahr', 'Jahr', 'KW', 'Klasse', 'Ausfall-Fach', 'Klassenstufe']
+    vp_group = vp_df.groupby(grp_cols)['Ausfall'].apply(lambda x: (x == True).sum()).reset_index(name='ausfall_count')
+    merged = pd.merge(vergleich_df, vp_group, on=grp_cols, how='left')
+    merged['ausfall_count'] = merged['ausfall_count'].fillna(0).astype(int)
+    merged['Ist'] = merged['Soll'] - merged['ausfall_count']
+    merged['Delta'] = merged['ausfall_count']
+    merged = pd.merge(merged, df_dates[['Jahr', 'KW']], on=['Jahr', 'KW'], how='inner')
+    merged['Keine-Daten'] = False
+    return merged
+
+
+def _normalize(df):
+    return df.sort_values('ID').reset_index(drop=True)
+
+
+def main(repeat=3):
+    vp_df = make_vertretungsplan()
+    vergleich_df = make_vergleich()
+    print(f'{len(vp_df)} Vertretungsplan-Datensätze, {len(vergleich_df)} Vergleichszeilen')
+
+    expected = calculate_ist_delta_legacy(vergleich_df.copy(), vp_df.copy(), SCHULJAHR)
+    result = calculate_ist_delta(vergleich_df.copy(), vp_df.copy(), SCHULJAHR)
+    pd.testing.assert_frame_equal(_normalize(result), _normalize(expected), check_dtype=False)
+    print(f'Ergebnisse identisch ({len(result)} Zeilen)')
+
+    t_legacy = min(timeit.repeat(
+        lambda: calculate_ist_delta_legacy(vergleich_df.copy(), vp_df.copy(), SCHULJAHR), number=1, repeat=repeat))
+    t_new = min(timeit.repeat(
+        lambda: calculate_ist_delta(vergleich_df.copy(), vp_df.copy(), SCHULJAHR), number=1, repeat=repeat))
+    print(f'groupby-apply (alt):        {t_legacy * 1000:8.1f} ms')
+    print(f'kategorial + size (neu):    {t_new * 1000:8.1f} ms')
+    print(f'Faktor:                     {t_legacy / t_new:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Micro-Benchmark für parse_xml auf einer synthetischen VplanKl-XML mit 500 <aktion>-Einträgen.
+
+Vergleicht die spaltenweise Implementierung aus vplan_parser mit der früheren
+zeilenweisen Implementierung (Dict pro Datensatz) und prüft, dass beide dasselbe liefern.
+
+Aufruf aus dem Projektverzeichnis:
+    python benchmarks/bench_parse_xml.py
+"""
+import hashlib
+import os
+import random
+import sys
+import timeit
+import xml.etree.ElementTree as ET
+
+import dateparser
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from klassen import extract_klassenstufe  # noqa: E402
+from schema import apply_vertretungsplan_schema  # noqa: E402
+from vplan_parser import parse_klasse, parse_stunde, parse_xml  # noqa: E402
+
+
+def build_synthetic_xml(n_actions=500, seed=42):
+    rng = random.Random(seed)
+    faecher = ['MA', 'DE', 'EN', 'BIO', 'CH', 'PH', 'GE', 'SP', 'KU', 'MU']
+    klassen = [f'{stufe}/{zug}' for stufe in range(5, 11) for zug in range(1, 5)] + \
+              [f'JG{jg}/{kurs}' for jg in (11, 12) for kurs in ('ma1', 'de2', 'inf2', 'en1')] + ['Klub', 'DAZ1']
+    aktionen = []
+    for _ in range(n_actions):
+        stufe = rng.randint(5, 10)
+        if rng.random() < 0.2:
+            klasse = f'{stufe}/1-{stufe}/{rng.randint(2, 4)}'
+        else:
+            klasse = rng.choice(klassen)
+        start = rng.randint(1, 7)
+        stunde = f'{start}-{start + 1}' if rng.random() < 0.3 else str(start)
+        fach = '---' if rng.random() < 0.3 else rng.choice(faecher)
+        lehrer = f'L{rng.randint(1, 80):02d}'
+        if fach == '---':
+            info = f'{rng.choice(faecher)} {lehrer} fällt aus'
+        elif rng.random() < 0.1:
+            info = 'Selbst. Arbeiten'
+        else:
+            info = ''
+        aktionen.append(
+            f'<aktion><klasse>{klasse}</klasse><stunde>{stunde}</stunde><fach>{fach}</fach>'
+            f'<lehrer>{lehrer}</lehrer><raum>R{rng.randint(100, 320)}</raum><info>{info}</info></aktion>'
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><vp><kopf><datei>VplanKl20241125.xml</datei>'
+        '<titel>Montag, 25. November 2024</titel></kopf><haupt>' + ''.join(aktionen) + '</haupt></vp>'
+    ).encode('utf-8')
+
+
+def parse_xml_legacy(xml_content):
+    """Frühere Implementierung: ein Dict pro Datensatz, danach DataFrame."""
+    data = []
+    root = ET.fromstring(xml_content)
+    kopf = root.find('kopf')
+    datei = kopf.find('datei').text
+    titel = kopf.find('titel').text
+    date_part = titel.strip().split(',')[1].strip()
+    datum_titel_obj = dateparser.parse(date_part, languages=['de'])
+
+    haupt = root.find('haupt')
+    for aktion in haupt.findall('aktion'):
+        klassen_liste = parse_klasse(aktion.find('klasse').text or '')
+        stunden_liste = parse_stunde(aktion.find('stunde').text or '')
+        fach = aktion.find('fach').text or ''
+        lehrer = aktion.find('lehrer').text or ''
+        raum = aktion.find('raum').text or ''
+        info = aktion.find('info').text or ''
+        ausfall = True if fach == '---' else False
+        selbststudium = True if 'selbst.' in info.lower() else False
+        ausfall_fach = ''
+        ausfall_lehrer = ''
+        if ausfall and 'fällt aus' in info:
+            words = info.replace('fällt aus', '').strip().split()
+            if len(words) >= 2:
+                ausfall_fach = words[0]
+                ausfall_lehrer = ' '.join(words[1:])
+            elif len(words) == 1:
+                ausfall_fach = words[0]
+        for klasse in klassen_liste:
+            for stunde in stunden_liste:
+                unique_str = f"{datum_titel_obj.strftime('%Y%m%d')}_{klasse}_{stunde}_{fach}_{lehrer}_{raum}_{info}"
+                unique_id = hashlib.md5(unique_str.encode('utf-8')).hexdigest()
+                data.append({
+                    'ID': unique_id, 'Datei': datei, 'Datum': datum_titel_obj, 'Klasse': klasse,
+                    'Stunde': stunde, 'Fach': fach, 'Lehrer': lehrer, 'Raum': raum, 'Info': info,
+                    'Ausfall': ausfall, 'Selbststudium': selbststudium, 'Ausfall-Fach': ausfall_fach,
+                    'Ausfall-Lehrer': ausfall_lehrer, 'Klassenstufe': extract_klassenstufe(klasse),
+                })
+    df = pd.DataFrame(data)
+    df['Klassenstufe'] = pd.to_numeric(df['Klassenstufe'], errors='coerce').astype('Int64')
+    return df
+
+
+def main(number=20):
+    xml_content = build_synthetic_xml()
+
+    legacy = parse_xml_legacy(xml_content)
+    current = parse_xml(xml_content)
+    # Verglichen wird nach dem Schema aus schema.py, das erst der Speicher beim Laden anwendet
+    pd.testing.assert_frame_equal(apply_vertretungsplan_schema(legacy.copy()),
+                                  apply_vertretungsplan_schema(current.copy()))
+    print(f'{len(current)} Datensätze aus 500 Aktionen, Ergebnisse identisch')
+
+    t_legacy = min(timeit.repeat(lambda: parse_xml_legacy(xml_content), number=number, repeat=3)) / number
+    t_current = min(timeit.repeat(lambda: parse_xml(xml_content), number=number, repeat=3)) / number
+    print(f'zeilenweise (alt): {t_legacy * 1000:8.2f} ms')
+    print(f'spaltenweise:      {t_current * 1000:8.2f} ms')
+    print(f'Speedup:           {t_legacy / t_current:8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Prüft die Importzeit (Kaltstart) der Seiten, der Kommandozeile und der Hilfsfunktionen.
+
+Jedes Ziel wird in einem frischen Interpreter mit `python -X importtime` importiert.
+Gemessen wird die Summe der Importe, die über den Start des Interpreters hinausgehen
+(Minimum aus mehreren Läufen). Das Skript endet mit Rückgabewert 1, wenn ein Ziel
+sein Budget überschreitet oder ein Paket lädt, das es erst bei Bedarf laden soll.
+
+Aufruf aus dem Projektverzeichnis:
+    python benchmarks/check_import_time.py [--scale 1.5] [--repeat 3]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _page(path):
+    # Seiten lassen sich wegen des Dateinamens nicht direkt importieren; main() läuft
+    # dank `if __name__ == "__main__"` dabei nicht
+    return ('import importlib.util as u; '
+            f's = u.spec_from_file_location("page", {path!r}); s.loader.exec_module(u.module_from_spec(s))')
+
+
+# Ziel -> (Python-Code, Budget in Millisekunden, Pakete, die dabei nicht geladen werden dürfen)
+TARGETS = {
+    'Hilfsfunktionen (utils)': (
+        'from utils import extract_klassenstufe, generate_year_week_pairs',
+        100, ['pandas', 'streamlit', 'gspread']),
+    'gsheet': ('import gsheet', 50, ['gspread', 'google.oauth2']),
+    'Kommandozeile (vplan)': ('import vplan', 1500, ['streamlit', 'gspread', 'altair', 'requests']),
+    'Seite Daten Vertretungsplan': (
+        _page('pages/1_Daten_Vertretungsplan.py'),
+        2000, ['altair', 'gspread', 'google.oauth2', 'requests']),
+    'Seite Vergleich SOLL': (
+        _page('pages/2_Vergleich_SOLL.py'),
+        2000, ['altair', 'gspread', 'google.oauth2', 'requests']),
+}
+
+
+def import_times(code):
+    """
+    Führt `code` mit -X importtime aus.
+
+    Rückgabe:
+    - Liste von (Modul, kumulierte Zeit in µs, oberste Ebene ja/nein)
+    """
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                         cwd=ROOT, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(f'Import fehlgeschlagen:\n{out.stderr[-2000:]}')
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        top_level = len(name) - len(name.lstrip()) == 1
+        rows.append((name.strip(), int(cumulative), top_level))
+    return rows
+
+
+def measure(code, baseline, repeat):
+    """Minimale Importzeit (ms) über `repeat` Läufe, die größten Importe und alle geladenen Module."""
+    best = None
+    for _ in range(repeat):
+        rows = [row for row in import_times(code) if row[0] not in baseline]
+        total = sum(cumulative for _, cumulative, top_level in rows if top_level) / 1000
+        if best is None or total < best[0]:
+            top = sorted(((c, n) for n, c, t in rows if t), reverse=True)[:3]
+            best = (total, top, {name for name, _, _ in rows})
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', type=float, default=1.0, help='Budgets für langsame Rechner vervielfachen')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    baseline = {name for name, _, _ in import_times('pass')}
+    failed = False
+    for target, (code, budget_ms, forbidden) in TARGETS.items():
+        total, top, modules = measure(code, baseline, args.repeat)
+        budget = budget_ms * args.scale
+        loaded = [package for package in forbidden if package in modules]
+        ok = total <= budget and not loaded
+        failed |= not ok
+        largest = ', '.join(f'{name} {cumulative / 1000:.0f} ms' for cumulative, name in top)
+        print(f"{'OK    ' if ok else 'FEHLER'} {target}: {total:.0f} ms (Budget {budget:.0f} ms) - {largest}")
+        if loaded:
+            print(f"       lädt beim Import bereits: {', '.join(loaded)}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Synthetisches Schuljahr als Fixture für die Benchmarks.
+
+Etwa 200 Schultage × 60 Klassen × 8 Stunden Vertretungsplan-Datensätze (wie sie
+load_vertretungsplan_data liefert) sowie die passenden Vergleichszeilen mit
+Soll-Stunden (wie load_vergleich_for_schuljahr).
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ids import make_ids  # noqa: E402
+from vergleich import build_vergleich_frame  # noqa: E402
+
+SCHULJAHR = '2024-25'
+FAECHER = ['MA', 'DE', 'EN', 'BIO', 'CH', 'PH', 'GE', 'SP', 'KU', 'MU']
+KLASSEN = [f'{stufe}/{zug}' for stufe in range(5, 11) for zug in range(1, 11)]  # 60 Klassen
+STUNDEN = 8
+
+
+def schultage(n_days=200):
+    """Die ersten `n_days` Werktage ab Schuljahresbeginn."""
+    return pd.bdate_range('2024-09-02', periods=n_days)
+
+
+def make_vertretungsplan(n_days=200, seed=0):
+    """Ein Datensatz pro Tag × Klasse × Stunde, etwa 15 % davon mit Ausfall."""
+    rng = np.random.default_rng(seed)
+    tage = schultage(n_days)
+    datum = np.repeat(tage.to_numpy(), len(KLASSEN) * STUNDEN)
+    klasse = np.tile(np.repeat(KLASSEN, STUNDEN), n_days)
+    stunde = np.tile(np.arange(1, STUNDEN + 1), n_days * len(KLASSEN))
+    n = len(datum)
+
+    fach = rng.choice(FAECHER, n).astype(object)
+    ausfall = rng.random(n) < 0.15
+    lehrer = np.char.add('L', rng.integers(10, 90, n).astype(str)).astype(object)
+    info = np.where(ausfall, fach + ' ' + lehrer + ' fällt aus', '')
+
+    df = pd.DataFrame({
+        'Datei': 'VplanKl' + pd.Series(datum).dt.strftime('%Y%m%d') + '.xml',
+        'Datum': datum,
+        'Klasse': klasse.astype(object),
+        'Stunde': stunde,
+        'Fach': np.where(ausfall, '---', fach),
+        'Lehrer': lehrer,
+        'Raum': np.char.add('R', rng.integers(100, 320, n).astype(str)).astype(object),
+        'Info': info,
+        'Ausfall': ausfall,
+        'Selbststudium': False,
+        'Ausfall-Fach': np.where(ausfall, fach, ''),
+        'Ausfall-Lehrer': np.where(ausfall, lehrer, ''),
+    })
+    df['Klassenstufe'] = pd.array(df['Klasse'].str.split('/').str[0].astype(int), dtype='Int64')
+    df.insert(0, 'ID', make_ids([df['Datum'].dt.strftime('%Y%m%d'), df['Klasse'], df['Stunde'],
+                                 df['Fach'], df['Lehrer'], df['Raum'], df['Info']]))
+    return df
+
+
+def make_vergleich(n_days=200):
+    """Vergleichszeilen für alle Kalenderwochen der synthetischen Schultage."""
+    iso = schultage(n_days).isocalendar()
+    soll = pd.DataFrame({'Klassenstufe': range(5, 11), **{fach: 3 for fach in FAECHER}})
+    df = build_vergleich_frame(SCHULJAHR, int(iso['year'].iloc[0]), int(iso['week'].iloc[0]),
+                               int(iso['year'].iloc[-1]), int(iso['week'].iloc[-1]), KLASSEN, soll)
+    for column in ['Jahr', 'KW', 'Soll', 'Ist', 'Delta']:
+        df[column] = df[column].astype('int64')
+    df['Klassenstufe'] = df['Klassenstufe'].astype('Int64')
+    df['Keine-Daten'] = True
+    return df
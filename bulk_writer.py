@@ -0,0 +1,178 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+
+from atomic import atomic_path
+from xml_cache import CACHE_DIR
+
+# Anzahl Zeilen pro Schreibaufruf
+CHUNK_ROWS = 5000
+# Wiederholungen bei 429 (Quota) und vorübergehenden Serverfehlern
+MAX_RETRIES = 6
+BACKOFF_SECONDS = 2.0
+RETRY_STATUS = (429, 500, 502, 503)
+# Namenszusatz des Staging-Blatts
+STAGING_SUFFIX = '__staging'
+# Namenszusatz des alten Blatts während des Tauschs
+OLD_SUFFIX = '__alt'
+
+
+def with_retry(func, *args, check_applied=None, **kwargs):
+    """
+    Führt einen gspread-Aufruf aus und wiederholt ihn bei 429/5xx mit exponentiellem Backoff.
+
+    Bei nicht idempotenten Aufrufen (Blatt anlegen oder löschen, Zeilen anhängen)
+    kann ein 5xx kommen, obwohl der Server die Änderung schon ausgeführt hat. Dafür
+    prüft `check_applied` vor jeder Wiederholung, ob das der Fall ist; liefert es
+    etwas anderes als None, wird das als Ergebnis übernommen statt erneut zu senden.
+    Ein 429 wird vor der Ausführung abgelehnt und ohne Prüfung wiederholt.
+    """
+    # Erst hier importieren: gspread ist teuer und wird nur zum Schreiben gebraucht
+    from gspread.exceptions import APIError
+    for attempt in range(MAX_RETRIES):
+        try:
+            return func(*args, **kwargs)
+        except APIError as err:
+            status = err.response.status_code
+            if status not in RETRY_STATUS or attempt == MAX_RETRIES - 1:
+                raise
+            delay = BACKOFF_SECONDS * 2 ** attempt + random.uniform(0, 1)
+            logging.warning(f'Google Sheets API antwortet mit {status}, neuer Versuch in {delay:.1f} s.')
+            time.sleep(delay)
+            if check_applied is not None and status != 429:
+                result = check_applied()
+                if result is not None:
+                    logging.info('Der fehlgeschlagene Aufruf wurde bereits ausgeführt, keine Wiederholung.')
+                    return result
+
+
+def _find_worksheet(conn, url, title, reload=False):
+    """Liefert das Tabellenblatt `title` oder None; mit `reload` frisch vom Server."""
+    from gspread.exceptions import WorksheetNotFound
+    if reload:
+        conn.forget(url)
+    try:
+        return conn.worksheet(url, title)
+    except WorksheetNotFound:
+        return None
+
+
+def _delete_worksheet(conn, url, worksheet):
+    title = worksheet.title
+    with_retry(conn.spreadsheet(url).del_worksheet, worksheet,
+               check_applied=lambda: True if _find_worksheet(conn, url, title, reload=True) is None else None)
+    conn.forget(url)
+
+
+def _swap_worksheets(conn, url, staging, old, title, old_title):
+    """
+    Benennt `old` in `old_title` und `staging` in `title` um und setzt `staging` an
+    die Position von `old`, alles in einem batch_update. Die Tabelle übernimmt die
+    Anfragen ganz oder gar nicht; Leser finden `title` also immer vor. Da die Anfragen
+    absolute Eigenschaften setzen, ist eine Wiederholung nach einem 5xx unschädlich.
+    """
+    requests = []
+    if old is not None:
+        requests.append({'updateSheetProperties': {
+            'properties': {'sheetId': old.id, 'title': old_title}, 'fields': 'title'}})
+        requests.append({'updateSheetProperties': {
+            'properties': {'sheetId': staging.id, 'title': title, 'index': old.index}, 'fields': 'title,index'}})
+    else:
+        requests.append({'updateSheetProperties': {
+            'properties': {'sheetId': staging.id, 'title': title}, 'fields': 'title'}})
+    with_retry(conn.spreadsheet(url).batch_update, {'requests': requests})
+
+
+def _checkpoint_path(url, title):
+    digest = hashlib.sha1(f'{url}|{title}'.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, 'bulk', f'{digest}.json')
+
+
+def _load_checkpoint(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_checkpoint(path, checkpoint):
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+
+
+def _fingerprint(header, rows):
+    digest = hashlib.sha256()
+    digest.update(json.dumps(header).encode('utf-8'))
+    for row in rows:
+        digest.update(json.dumps(row).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def write_worksheet(conn, url, title, header, rows, chunk_rows=CHUNK_ROWS):
+    """
+    Ersetzt den Inhalt eines Tabellenblatts vollständig durch `header` + `rows`.
+
+    Die Daten werden zuerst in ein vorab passend dimensioniertes Staging-Blatt
+    geschrieben, in Blöcken von `chunk_rows` Zeilen und mit Retry bei 429.
+    Nach jedem Block wird ein Checkpoint gespeichert, sodass ein abgebrochener
+    Lauf mit denselben Daten dort fortsetzt. Erst am Ende wird das Staging-Blatt
+    an die Stelle des alten Blatts getauscht; Leser sehen also nie ein leeres Blatt.
+
+    Parameter:
+    - conn: gsheet.GSheetConnection
+    - url, title: Spreadsheet und Name des Ziel-Tabellenblatts
+    - header: Liste der Spaltenüberschriften
+    - rows: Liste von Zeilen (Listen von Strings)
+    """
+    staging_title = f'{title}{STAGING_SUFFIX}'
+    old_title = f'{title}{OLD_SUFFIX}'
+    checkpoint_path = _checkpoint_path(url, title)
+    fingerprint = _fingerprint(header, rows)
+
+    # Fortsetzen, falls ein Checkpoint für genau diese Daten existiert
+    checkpoint = _load_checkpoint(checkpoint_path)
+    staging = None
+    if checkpoint and checkpoint.get('fingerprint') == fingerprint:
+        staging = _find_worksheet(conn, url, staging_title)
+        if staging is not None:
+            logging.info(f"Setze Schreiben von '{title}' bei Zeile {checkpoint['rows_written']} fort.")
+
+    if staging is None:
+        # Veraltetes Staging-Blatt eines abgebrochenen Laufs entfernen
+        stale = _find_worksheet(conn, url, staging_title, reload=True)
+        if stale is not None:
+            _delete_worksheet(conn, url, stale)
+        staging = with_retry(conn.add_worksheet, url, staging_title, rows=len(rows) + 1, cols=len(header),
+                             check_applied=lambda: _find_worksheet(conn, url, staging_title, reload=True))
+        with_retry(staging.update, values=[header], range_name='A1', value_input_option='RAW')
+        checkpoint = {'fingerprint': fingerprint, 'rows_written': 0}
+        _save_checkpoint(checkpoint_path, checkpoint)
+
+    # Daten blockweise schreiben (Zeile 1 ist die Kopfzeile)
+    for start in range(checkpoint['rows_written'], len(rows), chunk_rows):
+        chunk = rows[start:start + chunk_rows]
+        with_retry(staging.update, values=chunk, range_name=f'A{start + 2}', value_input_option='RAW')
+        checkpoint['rows_written'] = start + len(chunk)
+        _save_checkpoint(checkpoint_path, checkpoint)
+        logging.info(f"'{title}': {checkpoint['rows_written']} von {len(rows)} Zeilen geschrieben.")
+
+    # Staging-Blatt an die Stelle des alten Blatts tauschen
+    leftover = _find_worksheet(conn, url, old_title, reload=True)
+    if leftover is not None:
+        # Altes Blatt eines Tauschs, dessen Löschen abgebrochen wurde
+        _delete_worksheet(conn, url, leftover)
+    old = _find_worksheet(conn, url, title, reload=True)
+    _swap_worksheets(conn, url, staging, old, title, old_title)
+    if old is not None:
+        old = _find_worksheet(conn, url, old_title, reload=True)
+        if old is not None:
+            _delete_worksheet(conn, url, old)
+    conn.forget(url)
+
+    os.remove(checkpoint_path)
+    logging.info(f"Tabellenblatt '{title}' mit {len(rows)} Zeilen ersetzt.")
@@ -0,0 +1,185 @@
+import functools
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import pandas as pd
+
+from ids import content_keys
+
+# Standard-Gültigkeit eines Eintrags in Sekunden
+DEFAULT_TTL = 3600
+# Obergrenze für den gesamten Cache in Bytes
+MAX_BYTES = 512 * 1024 * 1024
+# Schlüssel der Versionsmarke in DataFrame.attrs
+VERSION_ATTR = 'version'
+
+
+def _size_of(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    return sys.getsizeof(value)
+
+
+def _copy(value):
+    # DataFrames werden von den Aufrufern teils in-place verändert
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    return value
+
+
+class SharedCache:
+    """
+    Prozessweiter Cache, den alle Streamlit-Sessions gemeinsam nutzen.
+
+    Einträge laufen nach ihrer TTL ab und werden nach LRU verdrängt, sobald
+    die Gesamtgröße `max_bytes` überschreitet. Einträge sind einem Namensraum
+    zugeordnet, der gezielt invalidiert werden kann.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (namespace, expires_at, size, value)
+        self._size = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}  # key -> [Lock, Anzahl ladender/wartender Sessions]
+
+    def get(self, key, count=True):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += count
+                return None, False
+            self._entries.move_to_end(key)
+            self.hits += count
+            return entry[3], True
+
+    def put(self, key, value, namespace, ttl=DEFAULT_TTL):
+        size = _size_of(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (namespace, time.monotonic() + ttl, size, value)
+            self._size += size
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, namespace=None):
+        """Entfernt alle Einträge eines Namensraums (oder alle, wenn None)."""
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if namespace is None or e[0] == namespace]:
+                self._remove(key)
+
+    @contextmanager
+    def key_lock(self, key):
+        """
+        Lock pro Schlüssel, damit gleichzeitige Sessions nur einmal laden.
+
+        Der Lock existiert nur, solange eine Session lädt oder darauf wartet; danach
+        wird er entfernt, sodass sich für wechselnde Argumente keine Locks ansammeln.
+        """
+        with self._lock:
+            entry = self._key_locks.get(key)
+            if entry is None:
+                entry = self._key_locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._key_locks[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._size,
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._size -= entry[2]
+
+
+_cache = SharedCache()
+
+
+def cached(namespace, ttl=DEFAULT_TTL):
+    """Dekorator: speichert das Ergebnis im prozessweiten Cache unter `namespace`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__module__, func.__qualname__, args, tuple(sorted(kwargs.items())))
+            value, found = _cache.get(key)
+            if found:
+                return _copy(value)
+            with _cache.key_lock(key):
+                # Eine andere Session könnte inzwischen geladen haben
+                value, found = _cache.get(key, count=False)
+                if not found:
+                    value = func(*args, **kwargs)
+                    _cache.put(key, value, namespace, ttl)
+            return _copy(value)
+        return wrapper
+    return decorator
+
+
+def invalidate(namespace=None):
+    _cache.invalidate(namespace)
+
+
+def stats():
+    return _cache.stats()
+
+
+def fingerprint(df):
+    """
+    Inhaltsbasierte Versionsmarke eines DataFrames (Anzahl Zeilen + Summe der
+    Inhaltsschlüssel aus ID, Ausfall, Ausfall-Fach und Klasse, siehe ids.content_keys).
+    """
+    if df.empty or 'ID' not in df:
+        return f'{len(df)}'
+    return f'{len(df)}-{int(content_keys(df).sum()):016x}'
+
+
+def set_version(df, token=None):
+    """
+    Hängt eine Versionsmarke an `df` (in `df.attrs`, bleibt bei copy() erhalten).
+
+    Die Marke wird beim Laden oder Speichern einmal vergeben; abhängige Caches
+    schlagen dann über die Marke statt über den Inhalt nach.
+    """
+    df.attrs[VERSION_ATTR] = (token if token is not None else fingerprint(df), len(df))
+    return df
+
+
+def version_of(df):
+    """
+    Versionsmarke von `df`; fehlt sie, wird sie einmal aus dem Inhalt berechnet.
+
+    pandas reicht `attrs` auch an gefilterte Teilmengen weiter. Passt die Zeilenzahl
+    nicht mehr zur Marke, wird deshalb ebenfalls neu berechnet.
+    """
+    version = df.attrs.get(VERSION_ATTR)
+    if version is None or version[1] != len(df):
+        version = set_version(df).attrs[VERSION_ATTR]
+    return version[0]
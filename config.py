@@ -0,0 +1,49 @@
+import functools
+import os
+import sys
+import tomllib
+
+# Dieselben Dateien, die auch Streamlit liest; die Projektdatei hat Vorrang.
+# Per Umgebungsvariable kann eine andere Datei angegeben werden (z. B. für cron).
+SECRETS_PATHS = [
+    os.path.join(os.path.expanduser('~'), '.streamlit', 'secrets.toml'),
+    os.path.join('.streamlit', 'secrets.toml'),
+]
+SECRETS_ENV = 'VPLAN_SECRETS'
+
+
+def _streamlit_running():
+    st = sys.modules.get('streamlit')
+    if st is None:
+        return False
+    from streamlit import runtime
+    return runtime.exists()
+
+
+@functools.lru_cache(maxsize=1)
+def _read_secrets_files():
+    paths = [os.environ[SECRETS_ENV]] if os.environ.get(SECRETS_ENV) else SECRETS_PATHS
+    secrets = {}
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                secrets.update(tomllib.load(f))
+        except FileNotFoundError:
+            continue
+    if not secrets:
+        raise FileNotFoundError(f'Keine Secrets gefunden (gesucht in: {", ".join(paths)})')
+    return secrets
+
+
+def get_secrets():
+    """
+    Liefert die Konfiguration der App.
+
+    Innerhalb von Streamlit ist das st.secrets; außerhalb (Hintergrundprozess,
+    Kommandozeile) werden dieselben secrets.toml-Dateien direkt gelesen, ohne
+    Streamlit zu importieren.
+    """
+    if _streamlit_running():
+        import streamlit as st
+        return st.secrets
+    return _read_secrets_files()
@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import xml_cache
+
+# URL-Basis der XML-Dateien
+BASE_URL = 'https://www.stundenplan24.de/10222573/vplan/vdaten/'
+
+# Maximale Anzahl gleichzeitiger Abrufe
+MAX_WORKERS = 8
+# Maximale Anzahl Anfragen pro Sekunde und Host
+REQUESTS_PER_SECOND = 10
+# Timeout pro Anfrage in Sekunden
+REQUEST_TIMEOUT = 30
+
+
+class HostRateLimiter:
+    """Verteilt Anfragen pro Host gleichmäßig auf höchstens `rate` Anfragen pro Sekunde."""
+
+    def __init__(self, rate=REQUESTS_PER_SECOND):
+        self.interval = 1.0 / rate
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def create_session(pool_size=MAX_WORKERS):
+    """Erstellt eine `requests.Session` mit Verbindungspool und Retry mit Backoff."""
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+# Prozessweite Session und Rate-Limiter, damit Verbindungen wiederverwendet werden
+_session = None
+_session_lock = threading.Lock()
+_rate_limiter = HostRateLimiter()
+
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+
+def fetch_xml(datum_str, username, password, session=None):
+    """
+    Ruft die XML-Datei für ein Datum ab und nutzt dabei den lokalen XML-Cache.
+
+    Gecachte Tage werden per If-None-Match/If-Modified-Since revalidiert,
+    bekannte 404-Tage werden bis zum Ablauf der TTL gar nicht abgefragt.
+
+    Rückgabe:
+    - (xml_content oder None, changed), wobei `changed` False ist, wenn der
+      Inhalt bereits verarbeitet wurde (siehe xml_cache.mark_processed).
+    """
+    logging.info(f"Verarbeite Datum: {datum_str}")
+    # URL der XML-Datei für das aktuelle Datum
+    xml_url = f'{BASE_URL}VplanKl{datum_str}.xml'
+    session = session or get_session()
+
+    entry = xml_cache.lookup(datum_str)
+    if xml_cache.is_known_missing(entry):
+        logging.info(f'Datei für das Datum {datum_str} laut Cache nicht vorhanden.')
+        return None, False
+
+    try:
+        # XML-Daten abrufen, falls vorhanden bedingt
+        _rate_limiter.wait(urlsplit(xml_url).netloc)
+        response = session.get(xml_url, auth=(username, password), timeout=REQUEST_TIMEOUT,
+                               headers=xml_cache.conditional_headers(entry))
+        if response.status_code == 304:
+            content = xml_cache.read_content(entry)
+            if content is not None:
+                xml_cache.touch(datum_str, entry)
+                return content, not xml_cache.is_processed(entry)
+            # Cache-Objekt fehlt, daher ohne Bedingung erneut abrufen
+            _rate_limiter.wait(urlsplit(xml_url).netloc)
+            response = session.get(xml_url, auth=(username, password), timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()  # Überprüft, ob die Anfrage erfolgreich war
+        changed = xml_cache.store(datum_str, response.content,
+                                  etag=response.headers.get('ETag'),
+                                  last_modified=response.headers.get('Last-Modified'))
+        return response.content, changed
+    except requests.exceptions.HTTPError as http_err:
+        if http_err.response.status_code == 404:
+            logging.info(f'Datei für das Datum {datum_str} nicht gefunden (404 Fehler).')
+            xml_cache.store_not_found(datum_str)
+        else:
+            logging.error(f'HTTP-Fehler aufgetreten: {http_err}')
+    except Exception as err:
+        logging.error(f'Ein unerwarteter Fehler ist aufgetreten: {err}')
+    return None, False
+
+
+# Funktion zum Abrufen der XML-Daten
+def retrieve_xml(datum_str, username, password, session=None):
+    content, _ = fetch_xml(datum_str, username, password, session=session)
+    return content
+
+
+def iter_xml_many(datum_strs, username, password, max_workers=MAX_WORKERS):
+    """
+    Ruft die XML-Dateien für mehrere Tage parallel über eine gemeinsame Session ab
+    und liefert sie in der Reihenfolge von `datum_strs`, sobald sie vorliegen.
+
+    Es sind höchstens 2 * `max_workers` Abrufe gleichzeitig offen, sodass auch bei
+    langsamer Weiterverarbeitung nur wenige XML-Dateien im Speicher liegen.
+
+    Rückgabe:
+    - Generator von (datum_str, xml_content oder None, changed) wie bei fetch_xml
+    """
+    datum_strs = list(datum_strs)
+    if not datum_strs:
+        return
+
+    session = get_session()
+    workers = max(1, min(max_workers, len(datum_strs)))
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for datum_str in datum_strs:
+            pending.append((datum_str, executor.submit(fetch_xml, datum_str, username, password, session)))
+            if len(pending) >= 2 * workers:
+                datum_str, future = pending.popleft()
+                yield (datum_str, *future.result())
+        while pending:
+            datum_str, future = pending.popleft()
+            yield (datum_str, *future.result())
+
+
+def retrieve_xml_many(datum_strs, username, password, max_workers=MAX_WORKERS, only_changed=False):
+    """
+    Ruft die XML-Dateien für mehrere Tage parallel über eine gemeinsame Session ab.
+
+    Mit `only_changed=True` wird für bereits verarbeitete Tage None geliefert,
+    sodass diese nicht erneut geparst werden müssen.
+
+    Rückgabe:
+    - Ein Dict {datum_str: xml_content oder None} in der Reihenfolge von `datum_strs`.
+    """
+    return {
+        datum_str: (content if changed or not only_changed else None)
+        for datum_str, content, changed in iter_xml_many(datum_strs, username, password, max_workers)
+    }
@@ -0,0 +1,45 @@
+import logging
+import re
+from datetime import datetime
+
+# Deutsche Monatsnamen (inkl. gängiger Schreibvarianten und Abkürzungen)
+MONATE = {
+    'januar': 1, 'jänner': 1, 'jan': 1,
+    'februar': 2, 'feb': 2,
+    'märz': 3, 'maerz': 3, 'mär': 3, 'mrz': 3,
+    'april': 4, 'apr': 4,
+    'mai': 5,
+    'juni': 6, 'jun': 6,
+    'juli': 7, 'jul': 7,
+    'august': 8, 'aug': 8,
+    'september': 9, 'sep': 9, 'sept': 9,
+    'oktober': 10, 'okt': 10,
+    'november': 11, 'nov': 11,
+    'dezember': 12, 'dez': 12,
+}
+
+# z. B. "25. November 2024" oder "Montag, 25. November 2024"
+_DATUM_RE = re.compile(r'^\s*(?:\w+,\s*)?(\d{1,2})\.\s*(\w+)\.?\s+(\d{4})\s*$')
+
+
+def parse_german_date(text):
+    """
+    Parst ein deutsches Datum wie "25. November 2024" in ein datetime-Objekt.
+
+    Das feste Format der Vertretungsplan-Titel wird per vorkompiliertem Regex und
+    Monatstabelle gelesen. Nur wenn das fehlschlägt, wird dateparser (erst dann)
+    importiert und als Fallback verwendet.
+    """
+    match = _DATUM_RE.match(text)
+    if match:
+        tag, monat_name, jahr = match.groups()
+        monat = MONATE.get(monat_name.lower())
+        if monat is not None:
+            try:
+                return datetime(int(jahr), monat, int(tag))
+            except ValueError:
+                pass
+
+    logging.warning(f"Datum '{text}' nicht im erwarteten Format, verwende dateparser.")
+    import dateparser
+    return dateparser.parse(text, languages=['de'])
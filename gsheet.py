@@ -0,0 +1,131 @@
+import contextvars
+import functools
+import logging
+import threading
+
+# gspread und google-auth werden erst beim Aufbau der Verbindung importiert,
+# damit `import gsheet` (Zähler der API-Aufrufe) den Kaltstart der Seiten nicht verlängert
+
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+
+# Zähler der API-Aufrufe des aktuellen Seitendurchlaufs
+_api_call_counter = contextvars.ContextVar('gsheet_api_calls', default=None)
+# Der Zähler wird auch aus den Threads von load_vergleich_for_schuljahre hochgezählt
+_counter_lock = threading.Lock()
+
+
+def _count_api_call():
+    counter = _api_call_counter.get()
+    if counter is not None:
+        with _counter_lock:
+            counter['calls'] += 1
+
+
+@functools.lru_cache(maxsize=None)
+def counting_http_client():
+    """gspread-HTTP-Client-Klasse, die jede Anfrage an die Google Sheets API mitzählt."""
+    from gspread.http_client import HTTPClient
+
+    class CountingHTTPClient(HTTPClient):
+        def request(self, *args, **kwargs):
+            _count_api_call()
+            return super().request(*args, **kwargs)
+
+    return CountingHTTPClient
+
+
+def start_api_call_count():
+    """
+    Startet die Zählung der API-Aufrufe für den aktuellen Seitendurchlauf.
+
+    Rückgabe:
+    - Ein Dict, dessen Eintrag 'calls' laufend hochgezählt wird.
+    """
+    counter = {'calls': 0}
+    _api_call_counter.set(counter)
+    return counter
+
+
+class GSheetConnection:
+    """
+    Hält den autorisierten gspread-Client sowie geöffnete Spreadsheets und
+    Tabellenblätter über Seitendurchläufe hinweg vor.
+
+    Das Zugriffstoken wird von der AuthorizedSession erst bei Bedarf
+    (abgelaufen oder 401) erneuert.
+
+    Die Lock schützt nur die Zwischenspeicher; Netzwerkaufrufe (open_by_url,
+    worksheet) laufen außerhalb, damit parallele Abrufe verschiedener Blätter
+    nicht aufeinander warten.
+    """
+
+    def __init__(self, credentials_info):
+        self._credentials_info = credentials_info
+        self._client = None
+        self._spreadsheets = {}
+        self._worksheets = {}
+        # Wird von forget() erhöht; ältere Abrufe werden danach nicht mehr zwischengespeichert
+        self._generation = 0
+        self._lock = threading.RLock()
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                import gspread
+                from google.oauth2.service_account import Credentials
+                credentials = Credentials.from_service_account_info(self._credentials_info, scopes=SCOPES)
+                self._client = gspread.authorize(credentials, http_client=counting_http_client())
+            return self._client
+
+    def _cached(self, cache, key, fetch):
+        with self._lock:
+            if key in cache:
+                return cache[key]
+            generation = self._generation
+        value = fetch()
+        with self._lock:
+            if generation != self._generation:
+                return value
+            return cache.setdefault(key, value)
+
+    def spreadsheet(self, url):
+        return self._cached(self._spreadsheets, url, lambda: self.client().open_by_url(url))
+
+    def worksheet(self, url, title=None):
+        """Liefert ein Tabellenblatt; ohne `title` das erste Blatt (sheet1)."""
+        def fetch():
+            sh = self.spreadsheet(url)
+            return sh.sheet1 if title is None else sh.worksheet(title)
+        return self._cached(self._worksheets, (url, title), fetch)
+
+    def add_worksheet(self, url, title, rows, cols):
+        worksheet = self.spreadsheet(url).add_worksheet(title=title, rows=rows, cols=cols)
+        with self._lock:
+            self._worksheets[(url, title)] = worksheet
+        return worksheet
+
+    def forget(self, url=None):
+        """Verwirft zwischengespeicherte Handles, z. B. nachdem Blätter umbenannt wurden."""
+        with self._lock:
+            self._generation += 1
+            if url is None:
+                self._spreadsheets.clear()
+                self._worksheets.clear()
+            else:
+                self._spreadsheets.pop(url, None)
+                for key in [k for k in self._worksheets if k[0] == url]:
+                    del self._worksheets[key]
+
+
+_connections = {}
+_connections_lock = threading.Lock()
+
+
+def get_connection(credentials_info):
+    """Liefert die prozessweit geteilte Verbindung für ein Dienstkonto."""
+    key = credentials_info.get('client_email', '')
+    with _connections_lock:
+        if key not in _connections:
+            logging.info('Neue Google-Sheets-Verbindung wird aufgebaut.')
+            _connections[key] = GSheetConnection(dict(credentials_info))
+        return _connections[key]
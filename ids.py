@@ -0,0 +1,64 @@
+import hashlib
+
+import pandas as pd
+
+# Modi der ID-Erzeugung
+MD5 = 'md5'        # bisherige 32-stellige MD5-Hex-IDs (kompatibel zu den gespeicherten Daten)
+HASH64 = 'hash64'  # 64-Bit-Hash (nicht kryptografisch) über die Spalten, vektorisiert
+
+# Spalten, deren Änderung bei gleicher ID das Ist/Delta-Ergebnis beeinflusst
+CONTENT_COLUMNS = ['Ausfall', 'Ausfall-Fach', 'Klasse']
+
+
+def make_ids(columns, mode=MD5):
+    """
+    Erzeugt IDs für ganze Spalten.
+
+    MD5 verbindet die Werte einer Zeile wie bisher mit '_', z. B.
+    "<Datum>_<Klasse>_<Stunde>_<Fach>_<Lehrer>_<Raum>_<Info>", und hasht jede Zeile
+    einzeln (kompatibel zu den gespeicherten Vertretungsplan-Daten). HASH64 hasht
+    die Spalten vektorisiert und eignet sich für IDs, die nicht mit gespeicherten
+    MD5-IDs übereinstimmen müssen.
+
+    Parameter:
+    - columns: Liste gleich langer Spalten (Listen, Arrays oder Series)
+    - mode: MD5 oder HASH64
+
+    Rückgabe:
+    - MD5: Liste von Hex-Strings, HASH64: numpy-Array vom Typ uint64
+    """
+    if mode == MD5:
+        return [hashlib.md5('_'.join(map(str, values)).encode('utf-8')).hexdigest()
+                for values in zip(*columns)]
+    if mode == HASH64:
+        frame = pd.DataFrame({i: pd.Series(column, dtype=object).astype(str).to_numpy()
+                              for i, column in enumerate(columns)})
+        return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    raise ValueError(f'Unbekannter ID-Modus: {mode}')
+
+
+def id_keys(ids):
+    """
+    Bildet bestehende IDs (z. B. MD5-Hex-Strings) auf kompakte uint64-Schlüssel ab.
+
+    Duplikat- und `isin`-Prüfungen laufen damit auf 8-Byte-Integern statt auf
+    32-stelligen Strings.
+    """
+    values = pd.Series(ids, dtype=object).astype(str).to_numpy()
+    return pd.util.hash_array(values, categorize=False)
+
+
+def content_keys(df):
+    """
+    uint64-Schlüssel pro Zeile über die ID und die vorhandenen Spalten aus CONTENT_COLUMNS.
+
+    Anders als id_keys ändert sich der Schlüssel auch, wenn ein Datensatz mit
+    gleicher ID z. B. ein anderes Ausfall-Fach erhält.
+    """
+    columns = ['ID'] + [column for column in CONTENT_COLUMNS if column in df]
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+
+
+def first_occurrences(keys):
+    """Maske der jeweils ersten Vorkommen der Schlüssel (wie drop_duplicates(keep='first'))."""
+    return ~pd.Series(keys).duplicated(keep='first').to_numpy()
@@ -0,0 +1,287 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from atomic import atomic_path
+from backfill import MAX_DAYS_PER_RUN, load_school_calendar, plan_backfill
+from config import get_secrets
+from timings import StageTimings
+import xml_cache
+from vplan_data import save_vertretungsplan_data, stored_days
+from xml_cache import CACHE_DIR
+
+# Abstand zwischen zwei Läufen des Hintergrund-Ingests in Sekunden
+DEFAULT_INTERVAL = 3600
+# Wie viele Tage vor dem letzten Schultag bei jedem Lauf erneut geprüft werden
+LOOKBACK_DAYS = 7
+
+
+def _lock_path():
+    return os.path.join(CACHE_DIR, 'ingest.lock')
+
+
+def _status_path():
+    return os.path.join(CACHE_DIR, 'ingest-status.json')
+
+
+def _lock_fd(fd):
+    # Nicht blockierend; OSError, wenn ein anderer Prozess/Thread die Sperre hält
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+
+
+def _unlock_fd(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class IngestLock:
+    """
+    Prozessübergreifende Sperre über eine Datei im Cache-Verzeichnis.
+
+    So ingestiert immer nur ein Prozess (Streamlit-Server oder cron-Lauf) und
+    innerhalb eines Prozesses nur ein Thread. Gesperrt wird mit flock (unter
+    Windows msvcrt.locking) auf einem eigenen Dateideskriptor; das Betriebssystem
+    gibt die Sperre frei, wenn der Prozess endet. Die Datei selbst bleibt liegen,
+    es gibt daher keine verwaisten Sperren und keine Übernahme nach Zeitablauf.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or _lock_path()
+        self._fd = None
+
+    def acquire(self):
+        """Versucht die Sperre zu bekommen, ohne zu warten. Rückgabe: True bei Erfolg."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_CREAT | os.O_RDWR)
+        try:
+            _lock_fd(fd)
+        except OSError:
+            os.close(fd)
+            return False
+        # Nur zur Information, wer gerade ingestiert
+        os.ftruncate(fd, 0)
+        os.write(fd, json.dumps({'pid': os.getpid(), 'started': time.time()}).encode('utf-8'))
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fd, self._fd = self._fd, None
+            try:
+                _unlock_fd(fd)
+            finally:
+                os.close(fd)
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def letzter_schultag(heute=None):
+    """Der Vortag bzw. am Montag der Freitag."""
+    heute = heute or datetime.now()
+    if heute.weekday() == 0:  # Montag
+        return heute - timedelta(days=3)
+    return heute - timedelta(days=1)
+
+
+def default_days(letzter=None):
+    """Wochentage (YYYYMMDD) der LOOKBACK_DAYS Tage bis zum letzten Schultag."""
+    letzter = letzter or letzter_schultag()
+    datum_range = pd.date_range(start=letzter - timedelta(days=LOOKBACK_DAYS), end=letzter, freq='D')
+    wochentage = datum_range[datum_range.weekday < 5]  # Montag=0, Sonntag=6
+    return [datum_obj.strftime('%Y%m%d') for datum_obj in wochentage]
+
+
+def plan_days(stored, force=False):
+    """
+    Tage für einen Ingest-Lauf.
+
+    Grundlage ist der Schulkalender (backfill.py): abgerufen werden genau die
+    fehlenden Schultage, die jüngsten zuerst und höchstens MAX_DAYS_PER_RUN.
+    Ohne Kalender wird wie bisher die Woche bis zum letzten Schultag geprüft,
+    falls dieser fehlt. Mit `force` wird die letzte Woche zusätzlich erneut geprüft.
+    Tage, deren XML abgerufen, aber nicht gespeichert wurde (z. B. nach einem
+    Fehler beim Export), werden immer erneut verarbeitet.
+
+    Rückgabe:
+    - (Liste von Tagen YYYYMMDD, Anzahl der danach noch fehlenden Tage)
+    """
+    calendar = load_school_calendar()
+    if calendar:
+        missing = plan_backfill(calendar, stored)
+        datum_strs, remaining = missing[:MAX_DAYS_PER_RUN], len(missing[MAX_DAYS_PER_RUN:])
+    else:
+        letzter = letzter_schultag()
+        datum_strs = default_days(letzter) if letzter.date() not in stored else []
+        remaining = 0
+    if force:
+        datum_strs += [d for d in reversed(default_days()) if d not in datum_strs]
+    datum_strs += [d for d in xml_cache.unprocessed_days() if d not in datum_strs]
+    return datum_strs, remaining
+
+
+def read_status():
+    """Ergebnis des letzten Ingest-Laufs (aus irgendeinem Prozess) oder None."""
+    try:
+        with open(_status_path(), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_status(status):
+    with atomic_path(_status_path()) as tmp_path:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(status, f)
+
+
+def _timed(batches, timings, name):
+    # Zeit für das Erzeugen der Batches (hier: Parsen) getrennt von ihrer Verarbeitung messen
+    batches = iter(batches)
+    while True:
+        with timings.stage(name):
+            batch = next(batches, None)
+        if batch is None:
+            return
+        yield batch
+
+
+def ingest_days(datum_strs, vorhandene_tage=(), timings=None):
+    """
+    Ruft die Vertretungspläne zu `datum_strs` ab und speichert neue Datensätze.
+
+    Bereits gespeicherte Tage werden nur erneut geparst, wenn ihr XML laut Cache
+    noch nicht verarbeitet wurde. Als verarbeitet markiert wird ein Tag erst, wenn
+    alle seine Datensätze gespeichert sind; schlägt das Speichern fehl, wird der
+    Tag beim nächsten Lauf erneut geparst.
+
+    Rückgabe:
+    - Die Anzahl der neu gespeicherten Datensätze.
+    """
+    # Abruf und Parser erst hier importieren: die Seiten importieren ingest nur für
+    # den Status und den Hintergrund-Thread
+    from fetch import iter_xml_many
+    from vplan_parser import iter_parse_many
+
+    timings = timings or StageTimings()
+    secrets = get_secrets()
+    username = secrets["username"]
+    password = secrets["password"]
+
+    # Tage, deren XML der Parser schon gelesen hat; die Datensätze des zuletzt
+    # gelesenen Tages können noch im nächsten Batch folgen
+    gelesen = []
+
+    def contents():
+        # Die Tage werden parallel abgerufen und jeweils sofort an den Parser gegeben;
+        # bereits gespeicherte Tage nur, wenn ihr XML noch nicht verarbeitet wurde
+        fetched = iter_xml_many(datum_strs, username, password)
+        for datum_str, content, changed in _timed(fetched, timings, 'abrufen'):
+            if content is None or (datum_str in vorhandene_tage and not changed):
+                continue
+            gelesen.append((datum_str, content))
+            yield content
+
+    # XML-Dateien im Streaming-Modus parsen und batchweise direkt speichern
+    new_rows = 0
+    for batch in _timed(iter_parse_many(contents()), timings, 'parsen'):
+        with timings.stage('speichern'):
+            new_rows += len(save_vertretungsplan_data(batch))
+        while len(gelesen) > 1:
+            xml_cache.mark_processed(*gelesen.pop(0))
+    for datum_str, content in gelesen:
+        xml_cache.mark_processed(datum_str, content)
+    return new_rows
+
+
+def run_ingestion(datum_strs=None, force=False, timings=None):
+    """
+    Ein Ingest-Lauf unter der IngestLock.
+
+    Ohne `datum_strs` werden die Tage nach `plan_days` bestimmt. Die Laufzeiten
+    der Schritte werden in `timings` (StageTimings) und im Status festgehalten.
+
+    Rückgabe:
+    - Die Anzahl der neu gespeicherten Datensätze, oder None, wenn bereits ein
+      anderer Prozess/Thread ingestiert.
+    """
+    lock = IngestLock()
+    if not lock.acquire():
+        logging.info('Ingest läuft bereits in einem anderen Prozess, Lauf übersprungen.')
+        return None
+    timings = timings or StageTimings()
+    started = time.time()
+    status = {'started': started, 'days': [], 'remaining': 0, 'new_rows': 0, 'error': None}
+    try:
+        with timings.stage('planen'):
+            stored = stored_days()
+            vorhandene_tage = {day.strftime('%Y%m%d') for day in stored}
+            if datum_strs is None:
+                datum_strs, status['remaining'] = plan_days(stored, force)
+        status['days'] = list(datum_strs)
+        if datum_strs:
+            status['new_rows'] = ingest_days(datum_strs, vorhandene_tage, timings)
+        logging.info(f"Ingest: {status['new_rows']} neue Datensätze aus {len(datum_strs)} Tagen "
+                     f"in {time.time() - started:.1f} s ({timings.summary()}).")
+        return status['new_rows']
+    except Exception as e:
+        status['error'] = f'{type(e).__name__}: {e}'
+        raise
+    finally:
+        status['finished'] = time.time()
+        status['timings'] = timings.seconds
+        _write_status(status)
+        lock.release()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def run_worker(interval, stop):
+    """Führt run_ingestion im Abstand von `interval` Sekunden aus, bis `stop` gesetzt ist."""
+    while not stop.is_set():
+        try:
+            run_ingestion()
+        except Exception:
+            logging.exception('Ingest fehlgeschlagen.')
+        stop.wait(interval)
+
+
+def start_background_ingestion(interval=DEFAULT_INTERVAL):
+    """
+    Startet den Ingest als Daemon-Thread, höchstens einmal pro Prozess.
+
+    Rückgabe:
+    - Ein threading.Event, mit dem der Thread beendet werden kann.
+    """
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            stop = threading.Event()
+            thread = threading.Thread(target=run_worker, args=(interval, stop),
+                                      name='vplan-ingest', daemon=True)
+            thread.start()
+            _worker = (thread, stop)
+            logging.info(f'Hintergrund-Ingest gestartet (alle {interval} s).')
+        return _worker[1]
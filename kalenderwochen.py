@@ -0,0 +1,26 @@
+from datetime import datetime, timedelta
+
+# Reine Kalenderfunktionen ohne pandas, damit sie schnell importierbar sind
+
+
+# Generierung von Kalenderwochen über den Jahreswechsel
+def generate_year_week_pairs(jahr_start, kw_start, jahr_ende, kw_ende):
+    """Generiert alle (Jahr, KW)-Paare von (jahr_start, kw_start) bis (jahr_ende, kw_ende) 
+    unter Verwendung einer wöchentlichen Schleife über Datum.
+    """
+    # Startdatum aus ISO Jahr-Woche berechnen (Montag der betreffenden Woche)
+    # %G = ISO Jahr, %V = ISO Woche, %u = ISO Wochentag (1=Montag)
+    start_str = f"{jahr_start}-W{kw_start}-1"
+    end_str = f"{jahr_ende}-W{kw_ende}-1"
+    start_date = datetime.strptime(start_str, "%G-W%V-%u")
+    end_date = datetime.strptime(end_str, "%G-W%V-%u")
+
+    pairs = []
+    current_date = start_date
+    while True:
+        iso_year, iso_week, iso_weekday = current_date.isocalendar()
+        pairs.append((iso_year, iso_week))
+        if iso_year == jahr_ende and iso_week == kw_ende:
+            break
+        current_date += timedelta(days=7)
+    return pairs
@@ -0,0 +1,58 @@
+import functools
+
+
+# Klassenstufe extrahieren
+def extract_klassenstufe(klasse_value):
+    if isinstance(klasse_value, str):
+        if 'Klub' in klasse_value:
+            # 'Klub' ignorieren
+            return None
+        elif 'DAZ' in klasse_value:
+            # 'DAZ' ignorieren
+            return None
+        elif 'JG' in klasse_value:
+            # Für Werte wie 'JG12/inf2'
+            parts = klasse_value.split('/')
+            if parts[0].startswith('JG'):
+                klassenstufe = parts[0][2:]  # Extrahiere die Zahl nach 'JG'
+                return int(klassenstufe)
+            else:
+                return None
+        elif '/' in klasse_value:
+            # Für Werte wie '6/4'
+            parts = klasse_value.split('/')
+            if parts[0].isdigit():
+                return int(parts[0])  # Die Zahl vor dem '/' ist die Klassenstufe
+            else:
+                return None
+        else:
+            # Weitere Fälle behandeln, falls nötig
+            return None
+    else:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def klassenstufe_cached(klasse_value):
+    """Memoisierte Variante von extract_klassenstufe (es gibt nur wenige Dutzend Klassen)."""
+    return extract_klassenstufe(klasse_value)
+
+
+def klassenstufe_series(klassen):
+    """
+    Bestimmt die Klassenstufe für eine ganze Spalte von Klassen.
+
+    Die Spalte wird faktorisiert, jede eindeutige Klasse wird nur einmal klassifiziert
+    und das Ergebnis über die Codes zurück auf alle Zeilen abgebildet. Der Aufwand ist
+    damit O(eindeutige Klassen) statt O(Zeilen).
+
+    Rückgabe:
+    - Eine Int64-Series (fehlende Klassenstufe als <NA>) mit dem Index der Eingabe.
+    """
+    # pandas erst hier, damit extract_klassenstufe ohne pandas importierbar bleibt
+    import pandas as pd
+
+    klassen = pd.Series(klassen)
+    codes, uniques = pd.factorize(klassen)
+    lookup = pd.array([klassenstufe_cached(klasse) for klasse in uniques], dtype='Int64')
+    return pd.Series(lookup.take(codes, allow_fill=True), index=klassen.index, name='Klassenstufe')
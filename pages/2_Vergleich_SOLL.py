@@ -1,226 +1,26 @@
 import streamlit as st
 import logging
-import hashlib
-import pandas as pd
-import gspread
-import altair as alt
 
-from google.oauth2.service_account import Credentials
-import streamlit as st
-from utils import extract_klassenstufe
-from utils import generate_year_week_pairs
-from utils import load_vergleich_for_schuljahr
-from utils import load_vertretungsplan_data_from_gsheet
+import gsheet
+import ui
+import cache
+from utils import init_vergleich_tables
+from utils import load_schuljahre
+from utils import load_vergleich_for_schuljahre
+from utils import load_vertretungsplan_data
+from vergleich import Schuljahre
+from vergleich import get_ist_delta_partitions
 
 
 def init_vergleich_table():
-    # Google Sheets API initialisieren
-    scope = ['https://www.googleapis.com/auth/spreadsheets']
-    credentials = Credentials.from_service_account_info(
-        st.secrets["connections"]["gsheets"]["credentials"],
-        scopes=scope
-    )
-    gc = gspread.authorize(credentials)
-    
-    # Haupt-Spreadsheet öffnen (Anpassen an Ihre URL)
-    sh = gc.open_by_url(st.secrets["connections"]["gsheets"]["vergleich-sollstunden"])
-    
-    # Tabellenblatt "schuljahr" laden
-    worksheet_schuljahr = sh.worksheet("schuljahr")
-    data_schuljahr = worksheet_schuljahr.get_all_records()
-    df_schuljahr = pd.DataFrame(data_schuljahr)
-
-
-    # Headers für "vergleich"
-    vergleich_header = ["ID","Schuljahr","Jahr","KW","Klasse","Fach","Klassenstufe","Soll","Ist","Delta","Keine-Daten"]
-
-    schuljahr_data = {}  # key: schuljahr, value: list of rows
-
-    for idx, row in df_schuljahr.iterrows():
-        schuljahr = str(row['Schuljahr'])
-        jahr_start = int(row['Jahr-Start'])
-        kw_start = int(row['KW-Start'])
-        jahr_ende = int(row['Jahr-Ende'])
-        kw_ende = int(row['KW-Ende'])
-        klassen_str = str(row['Klassen'])
-        klassen_liste = [k.strip() for k in klassen_str.split(';') if k.strip()]
-
-        # Name des Soll-Blatts bestimmen
-        soll_sheet_name = "soll-" + schuljahr
-        worksheet_soll = sh.worksheet(soll_sheet_name)
-        data_soll = worksheet_soll.get_all_records()
-        df_soll = pd.DataFrame(data_soll)
-
-        # Spalten säubern, sicherstellen dass Klassenstufe numerisch ist
-        df_soll['Klassenstufe'] = pd.to_numeric(df_soll['Klassenstufe'], errors='coerce')
-
-        # Fächer bestimmen (alle Spalten außer Klassenstufe)
-        subjects = [col for col in df_soll.columns if col != "Klassenstufe"]
-
-        # Alle (jahr, kw) Paare generieren
-        year_week_pairs = generate_year_week_pairs(jahr_start, kw_start, jahr_ende, kw_ende)
-
-        # Liste für dieses Schuljahr initialisieren, falls noch nicht vorhanden
-        if schuljahr not in schuljahr_data:
-            schuljahr_data[schuljahr] = []
-
-        # Durch alle Jahr/KW Paare iterieren
-        for (y, w) in year_week_pairs:
-            for klasse in klassen_liste:
-                klassenstufe = extract_klassenstufe(klasse)
-                if klassenstufe is None:
-                    logging.warning(f"Keine Klassenstufe für Klasse '{klasse}' extrahierbar.")
-                    continue
-
-                df_soll_row = df_soll.loc[df_soll['Klassenstufe'] == klassenstufe]
-                if df_soll_row.empty:
-                    logging.warning(f"Keine Soll-Daten für Klassenstufe {klassenstufe} im Schuljahr {schuljahr}.")
-                    continue
-
-                # Für jedes Fach nur Zeile anlegen, wenn Soll != 0
-                for fach in subjects:
-                    soll_wert = df_soll_row[fach].values[0]
-
-                    # Nur wenn Soll != 0
-                    if soll_wert != 0:
-                        ist = 0
-                        delta = 0 
-                        keine_daten = True
-
-                        unique_str = f"{schuljahr}_{y}_{w}_{klasse}_{fach}"
-                        unique_id = hashlib.md5(unique_str.encode('utf-8')).hexdigest()
-
-                        schuljahr_data[schuljahr].append([
-                            unique_id,
-                            schuljahr,
-                            y,
-                            w,
-                            klasse,
-                            fach,
-                            klassenstufe,
-                            soll_wert,
-                            ist,
-                            delta,
-                            'True' if keine_daten else 'False'
-                        ])
-    
-    
-    # Jetzt schreiben wir für jedes Schuljahr ein eigenes Tabellenblatt
-    for sj, rows in schuljahr_data.items():
-        sheet_title = f"vergleich-{sj}"
-        try:
-            wsv = sh.worksheet(sheet_title)
-        except:
-            wsv = sh.add_worksheet(title=sheet_title, rows=1000, cols=len(vergleich_header))
-        
-        wsv.clear()
-        wsv.append_row(vergleich_header, value_input_option='RAW')
-        
-        if rows:
-            # Alle Werte in Strings umwandeln:
-            rows_str = [[str(x) for x in row] for row in rows]
-            wsv.append_rows(rows_str, value_input_option='RAW')
-        else:
-            logging.info(f"Keine Zeilen für Schuljahr {sj} generiert, vermutlich Soll=0 für alle Fächer?")
-
-    logging.info("Vergleich-Tabellen pro Schuljahr erfolgreich initialisiert!")
+    # Vergleichszeilen erzeugen und pro Schuljahr in ein eigenes Tabellenblatt schreiben
+    init_vergleich_tables()
     st.success('Vergleich-Tabellen wurden erfolgreich initialisiert!')
 
-@st.cache_data(ttl=3600)
-def calculate_ist_delta(vergleich_df, vp_df, schuljahr: str):
-    """
-    Berechnet Ist- und Delta-Werte auf Basis der Ausfalldaten.
-    Logik:
-    - Bestimme die minimalen Jahr/KW aus vp_df.
-    - Filtere vergleich_df, sodass nur Jahr/KW ab dieser minimalen Grenze berücksichtigt werden.
-    - Gruppiere vp_df nach (Schuljahr, Jahr, KW, Klasse, Fach, Klassenstufe), zähle Ausfallstunden (Ausfall=True).
-    - Ist = Soll - Ausfall_count
-    - Delta = Ausfall_count
-    - Wenn Ausfall_count=0 => Ist=Soll, Delta=0
-
-    Parameter:
-    - vergleich_df: Enthält Spalten [Schuljahr, Jahr, KW, Klasse, Fach, Klassenstufe, Soll]
-    - vp_df: Enthält Vertretungsplan-Daten mit 'Ausfall' (bool), 'Klasse', 'Ausfall-Fach', 'Klassenstufe', 'Datum'
-    - schuljahr: String, z. B. "2024/25"
-
-    Rückgabe:
-    - Ein DataFrame mit zusätzlichen Spalten Ist und Delta.
-    """
-    # Duplikate entfernen
-    vp_df = vp_df.drop_duplicates(subset=['ID'], keep='first')
-
-    # Schuljahr als String sicherstellen
-    vergleich_df['Schuljahr'] = vergleich_df['Schuljahr'].astype(str)
-    # Schuljahr an vp_df setzen
-    vp_df['Schuljahr'] = schuljahr
-
-    # Datentypen angleichen
-    # Klassenstufe auf beiden Seiten Int64
-    vergleich_df['Klassenstufe'] = pd.to_numeric(vergleich_df['Klassenstufe'], errors='coerce').astype('Int64', errors='ignore')
-    vp_df['Klassenstufe'] = pd.to_numeric(vp_df['Klassenstufe'], errors='coerce').astype('Int64', errors='ignore')
-
-    # Fach und Klasse strippen
-    vergleich_df['Ausfall-Fach'] = vergleich_df['Fach'].astype(str).str.strip()
-    vergleich_df['Klasse'] = vergleich_df['Klasse'].astype(str).str.strip()
-
-    vp_df['Ausfall-Fach'] = vp_df['Ausfall-Fach'].astype(str).str.strip()
-    vp_df['Klasse'] = vp_df['Klasse'].astype(str).str.strip()
-
-    # ISO-Kalenderwoche aus vp_df extrahieren
-    iso_cal = vp_df['Datum'].dt.isocalendar()
-    vp_df['Jahr'] = iso_cal['year']
-    vp_df['KW'] = iso_cal['week']
-
-    # Minimale Jahr/KW aus vp_df bestimmen
-    df_dates = vp_df[['Jahr','KW']].dropna().drop_duplicates().astype(int).sort_values(by=['Jahr','KW'])
-    if df_dates.empty:
-        # Falls vp_df leer ist oder keine Daten enthält
-        # Dann hat man keine Ist-Werte, Ist=Soll, Delta=0
-        # Hier können wir einfach vergleich_df mit Ist=Soll, Delta=0 zurückgeben
-        vergleich_df['Ist'] = vergleich_df['Soll']
-        vergleich_df['Delta'] = 0
-        return vergleich_df
-    
-    #st.write("Kalenderwochen zur Berechnung: ")
-    #st.write(df_dates['KW'])
-
-    min_jahr = df_dates.iloc[0]['Jahr']
-    min_kw = df_dates.iloc[0]['KW']
-
-    # vergleich_df filtern ab min_jahr/min_kw
-    vergleich_df = vergleich_df[((vergleich_df['Jahr'] > min_jahr) | ((vergleich_df['Jahr'] == min_jahr) & (vergleich_df['KW'] >= min_kw)))]
-
-    grp_cols = ['Schuljahr','Jahr','KW','Klasse','Ausfall-Fach','Klassenstufe']
-
-    # Ausfallstunden zählen
-    # (x == True).sum() zählt, wie oft Ausfall True ist
-    vp_group = vp_df.groupby(grp_cols)['Ausfall'].apply(lambda x: (x == True).sum()).reset_index(name='ausfall_count')
-
-    #st.write(vp_group)
-
-    # Merge
-    merged = pd.merge(vergleich_df, vp_group, on=grp_cols, how='left')
-    merged['ausfall_count'] = merged['ausfall_count'].fillna(0).astype(int)
-
-    # Ist und Delta berechnen
-    # Ist = Soll - ausfall_count
-    # Delta = ausfall_count
-    merged['Ist'] = merged['Soll'] - merged['ausfall_count']
-    merged['Delta'] = merged['ausfall_count']
-
-    # Nun alle KW filtern, die in vp_df tatsächlich vorkommen (nicht nur ab min_jahr/min_kw)
-    # Durch den Merge mit df_dates behalten wir nur die (Jahr, KW), die auch in vp_df vorkommen.
-    merged = pd.merge(merged, df_dates[['Jahr','KW']], on=['Jahr','KW'], how='inner')
-    merged['Keine-Daten'] = False
-
-    # Wenn Ausfall_count=0 => Ist=Soll, Delta=0, ist schon erfüllt durch Ist=Soll -0, Delta=0
-
-    return merged
-
 # Daten darstellen
 def visualize_data(merged):
-    # Erstellt eine Hilfsspalte JahrKW für die X-Achse
-    merged['JahrKW'] = merged['Jahr'].astype(str) + '-KW' + merged['KW'].astype(str)
+    # altair erst laden, wenn tatsächlich ein Diagramm gezeichnet wird
+    import altair as alt
 
     # Sidebar-Filter
     # Klasse-Filter
@@ -236,17 +36,21 @@ def visualize_data(merged):
     selected_faecher = st.sidebar.multiselect("Fach", options=fach_options, default='Alle')
 
     # Filter anwenden
-    df_filtered = merged.copy()
+    df_filtered = merged
     if 'Alle' not in selected_klassen:
         df_filtered = df_filtered[df_filtered['Klasse'].isin(selected_klassen)]
     if 'Alle' not in selected_faecher:
         df_filtered = df_filtered[df_filtered['Fach'].isin(selected_faecher)]
 
+    # Bereits hier auf das dargestellte Raster (eine Zeile pro Jahr/KW) summieren,
+    # statt alle Zeilen an den Browser zu schicken und dort zu summieren
+    df_agg = df_filtered.groupby(['Jahr','KW'], as_index=False)[['Ist','Delta']].sum()
+    df_agg['JahrKW'] = df_agg['Jahr'].astype(str) + '-KW' + df_agg['KW'].astype(str)
 
     # Nun Wandeln wir `Ist` und `Delta` in Long-Format, damit Altair stacked bars darstellen kann
     # Wir haben zwei Kategorien: 'Ist' und 'Delta'
-    df_melted = df_filtered.melt(
-        id_vars=['Schuljahr','Jahr','KW','Klasse','Fach','Klassenstufe','Soll','JahrKW','Keine-Daten'],
+    df_melted = df_agg.melt(
+        id_vars=['Jahr','KW','JahrKW'],
         value_vars=['Ist','Delta'],
         var_name='Art',
         value_name='Stunden'
@@ -254,41 +58,45 @@ def visualize_data(merged):
 
     # Wir möchten ein gestapeltes Balkendiagramm:
     # X-Achse: JahrKW
-    # Y-Achse: sum(Stunden)
+    # Y-Achse: Stunden (bereits summiert)
     # Farbe: Art (Ist oder Delta)
     chart = alt.Chart(df_melted).mark_bar().encode(
         x=alt.X('JahrKW:N', title='Jahr-KW', sort=None),
-        y=alt.Y('sum(Stunden):Q', title='Stunden'),
+        y=alt.Y('Stunden:Q', title='Stunden'),
         color=alt.Color('Art:N', title='Art', scale=alt.Scale(domain=['Ist','Delta'], range=['#4daf4a','#e41a1c'])),
-        tooltip=['Schuljahr','Jahr','KW','Klasse','Fach','Klassenstufe','Soll','Art','Stunden']
+        tooltip=['Jahr','KW','Art','Stunden']
     ).properties(
         width=800,
         height=400
     )
 
     st.write("Überblick von  Ist und Ausfall Stunden pro Jahr/KW")
-    st.altair_chart(chart, use_container_width=True)
+    ui.altair_chart(chart, use_container_width=True)
 
 
-def visualize_heatmaps(merged):
-    # JahrKW erstellen, falls nicht vorhanden
-    if 'JahrKW' not in merged.columns:
-        merged['JahrKW'] = merged['Jahr'].astype(str) + '-KW' + merged['KW'].astype(str)
+def _heatmap_data(rollup, by, schuljahre):
+    # Wochen-Rollup (Soll/Ist/Delta pro Woche und Fach bzw. Klasse) für die Heatmap aufbereiten
+    rollup = rollup[rollup['Schuljahr'].isin(schuljahre)]
+    df_agg = rollup[['Schuljahr','Jahr','KW',by,'Delta','Soll']].copy()
+    df_agg.insert(3, 'JahrKW', df_agg['Jahr'].astype(str) + '-KW' + df_agg['KW'].astype(str))
+    df_agg['RelDelta'] = (df_agg['Delta']/df_agg['Soll'])*100
+    return df_agg
 
-    # Nur Delta != 0 Zeilen anzeigen
-    #df_delta = merged[merged['Delta'] != 0].copy()
-    df_delta = merged.copy()
-    if df_delta.empty:
-        st.write("Keine Abweichungen vorhanden (Delta=0 für alle gefilterten Einträge).")
-        return
 
-    # Für die Fach-Heatmap aggregieren wir nach (JahrKW, Fach)
-    df_fach_agg = df_delta.groupby(['Schuljahr','Jahr','KW','JahrKW','Fach'], as_index=False).agg({'Delta':'sum','Soll':'sum'})
-    df_fach_agg['RelDelta'] = (df_fach_agg['Delta']/df_fach_agg['Soll'])*100
+def visualize_heatmaps(partitions, schuljahre):
+    """
+    Heatmaps der relativen Abweichungen pro Fach und pro Klasse.
+
+    Gelesen werden die vorverdichteten Wochen-Rollups der IstDeltaPartitions
+    statt der einzelnen Vergleichszeilen.
+    """
+    import altair as alt
 
-    # Für die Klassen-Heatmap aggregieren wir nach (JahrKW, Klasse)
-    df_klasse_agg = df_delta.groupby(['Schuljahr','Jahr','KW','JahrKW','Klasse'], as_index=False).agg({'Delta':'sum','Soll':'sum'})
-    df_klasse_agg['RelDelta'] = (df_klasse_agg['Delta']/df_klasse_agg['Soll'])*100
+    df_fach_agg = _heatmap_data(partitions.rollup('Fach'), 'Fach', schuljahre)
+    df_klasse_agg = _heatmap_data(partitions.rollup('Klasse'), 'Klasse', schuljahre)
+    if df_fach_agg.empty:
+        st.write("Keine Abweichungen vorhanden (Delta=0 für alle gefilterten Einträge).")
+        return
 
     # Heatmap 1: nach Fach
     fach_heatmap = alt.Chart(df_fach_agg).mark_rect().encode(
@@ -317,17 +125,51 @@ def visualize_heatmaps(merged):
     )
 
 
-    st.altair_chart(fach_heatmap, use_container_width=True)
-    st.altair_chart(klassen_heatmap, use_container_width=True)
+    ui.altair_chart(fach_heatmap, use_container_width=True)
+    ui.altair_chart(klassen_heatmap, use_container_width=True)
+
 
+# Hauptprogramm für Streamlit
+def main():
+    st.title("Vergleich zu SOLL Stunden")
+    st.write("Hier können Sie Ihre Daten anzeigen.")
 
-# Beispielhafter Aufruf
-st.title("Vergleich zu SOLL Stunden")
-st.write("Hier können Sie Ihre Daten anzeigen.")
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # Google-Sheets-API-Aufrufe dieses Durchlaufs zählen
+    api_calls = gsheet.start_api_call_count()
+    payload = ui.start_payload_count()
+    #init_vergleich_table()
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-#init_vergleich_table()
-ist = calculate_ist_delta(load_vergleich_for_schuljahr("2024-25"),load_vertretungsplan_data_from_gsheet(),"2024-25")
-st.write(ist)
-visualize_data(ist)
-visualize_heatmaps(ist)
\ No newline at end of file
+    # Alle Schuljahre aus dem Tabellenblatt 'schuljahr'
+    df_schuljahr = load_schuljahre()
+    if df_schuljahr.empty:
+        st.info('Keine Schuljahre vorhanden.')
+        return
+    schuljahre = Schuljahre(df_schuljahr)
+
+    # Vergleich-Tabellenblätter aller Schuljahre gleichzeitig laden
+    vergleich_df = load_vergleich_for_schuljahre(schuljahre.namen)
+    if vergleich_df.empty:
+        st.info('Keine Vergleichsdaten vorhanden.')
+        return
+    vp_df = load_vertretungsplan_data()
+    # Vertretungsplan-Datensätze werden über ihr Datum dem Schuljahr zugeordnet;
+    # nur die Wochen mit neuen Vertretungsplan-Daten werden neu berechnet.
+    # Nachschlag über die Versionsmarken statt über den Inhalt der DataFrames
+    partitions = get_ist_delta_partitions(schuljahre)
+    ist = partitions.ist_delta(vergleich_df, vp_df, cache.version_of(vergleich_df), cache.version_of(vp_df))
+
+    # Schuljahre für Tabelle und Diagramme auswählen (Standard: alle)
+    selected_schuljahre = st.sidebar.multiselect('Schuljahr', options=schuljahre.namen, default=schuljahre.namen)
+    ist = ist[ist['Schuljahr'].isin(selected_schuljahre)]
+
+    # Tabelle seitenweise statt vollständig an den Browser senden
+    ui.dataframe(ist, key='ist_seite')
+    visualize_data(ist)
+    visualize_heatmaps(partitions, selected_schuljahre)
+    logging.info(f"Google-Sheets-API-Aufrufe in diesem Durchlauf: {api_calls['calls']}")
+    ui.log_payload_count(payload)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import logging
+import os
+
+import pandas as pd
+
+from atomic import atomic_path
+from ids import first_occurrences, id_keys
+from schema import apply_vertretungsplan_schema
+
+# Dimensionen des Tageswürfels: alles, wonach die Seite "Daten Vertretungsplan" filtert
+DAILY_KEYS = ['Datum', 'Klasse', 'Klassenstufe', 'Ausfall-Fach', 'Ausfall', 'Selbststudium']
+# Wochen-Rollups der Vergleichsdaten (Soll/Ist/Delta) pro Fach bzw. pro Klasse
+WEEKLY_KEYS = ['Schuljahr', 'Jahr', 'KW']
+# Schlüssel der Versionsmarke in den Metadaten der Würfel-Datei
+VERSION_KEY = b'vplan.version'
+
+
+def daily_rollup(df):
+    """
+    Verdichtet Vertretungsplan-Datensätze auf die Anzahl pro DAILY_KEYS.
+
+    Rückgabe:
+    - DataFrame mit den Spalten DAILY_KEYS + ['Anzahl']
+    """
+    if df.empty:
+        return pd.DataFrame(columns=DAILY_KEYS + ['Anzahl'])
+    if 'ID' in df:
+        # Duplikate entfernen
+        df = df[first_occurrences(id_keys(df['ID']))]
+    df = apply_vertretungsplan_schema(df[DAILY_KEYS].copy())
+    cube = df.groupby(DAILY_KEYS, observed=True, dropna=False, sort=False).size().reset_index(name='Anzahl')
+    return apply_vertretungsplan_schema(cube)
+
+
+def merge_daily(cube, new_cube):
+    """Addiert einen Würfel neuer Datensätze auf einen bestehenden Würfel."""
+    if cube.empty:
+        return new_cube
+    if new_cube.empty:
+        return cube
+    combined = pd.concat([cube, new_cube], ignore_index=True)
+    # pd.concat macht kategoriale Spalten mit abweichenden Kategorien zu object
+    combined = apply_vertretungsplan_schema(combined)
+    merged = combined.groupby(DAILY_KEYS, observed=True, dropna=False, sort=False)['Anzahl'].sum().reset_index()
+    return apply_vertretungsplan_schema(merged)
+
+
+def weekly_rollup(merged, by):
+    """
+    Summiert Soll, Ist und Delta der Vergleichszeilen pro Woche und `by` ('Fach' oder 'Klasse').
+
+    Rückgabe:
+    - DataFrame mit WEEKLY_KEYS + [by, 'Soll', 'Ist', 'Delta']
+    """
+    return merged.groupby(WEEKLY_KEYS + [by], as_index=False, observed=True)[['Soll', 'Ist', 'Delta']].sum()
+
+
+class DailyRollupStore:
+    """
+    Persistierter Tageswürfel neben dem lokalen Parquet-Speicher.
+
+    In den Metadaten der Würfel-Datei steht die Versionsmarke des Speichers, zu
+    der er passt (siehe ParquetStore.version). Passt sie nicht mehr, etwa weil Daten
+    an anderer Stelle geschrieben wurden, wird der Würfel neu aufgebaut. Würfel und
+    Versionsmarke werden mit einem einzigen os.replace geschrieben, sodass auch
+    gleichzeitige Schreiber (Seite und Hintergrund-Ingest) sie nicht vermischen.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    @property
+    def cube_path(self):
+        return os.path.join(self.path, 'daily.parquet')
+
+    def load(self, version):
+        """Liefert den Würfel zur Versionsmarke `version` oder None."""
+        import pyarrow.parquet as pq
+
+        try:
+            table = pq.read_table(self.cube_path)
+        except (OSError, ValueError):
+            return None
+        if (table.schema.metadata or {}).get(VERSION_KEY) != version.encode('utf-8'):
+            return None
+        return apply_vertretungsplan_schema(table.to_pandas())
+
+    def save(self, cube, version):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(cube, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), VERSION_KEY: version.encode('utf-8')})
+        with atomic_path(self.cube_path) as tmp_path:
+            pq.write_table(table, tmp_path)
+
+    def update(self, new_rows, old_version, new_version):
+        """
+        Addiert neu gespeicherte Datensätze auf den Würfel.
+
+        Passt der gespeicherte Würfel nicht zu `old_version`, wird nichts getan;
+        der nächste Ladevorgang baut ihn dann vollständig neu auf.
+        """
+        cube = self.load(old_version)
+        if cube is None:
+            return False
+        self.save(merge_daily(cube, daily_rollup(new_rows)), new_version)
+        logging.info(f'Tageswürfel um {len(new_rows)} Datensätze ergänzt.')
+        return True
@@ -0,0 +1,63 @@
+import pandas as pd
+
+# Datentypen der Vertretungsplan-Spalten im Speicher.
+# Spalten mit wenigen verschiedenen Werten werden kategorial gehalten, die
+# (nahezu) eindeutigen Spalten als Arrow-Strings statt als Python-Objekte.
+VERTRETUNGSPLAN_DTYPES = {
+    'ID': 'string[pyarrow]',
+    'Datei': 'category',
+    'Datum': 'datetime64[ns]',
+    'Klasse': 'category',
+    'Stunde': 'Int8',
+    'Fach': 'category',
+    'Lehrer': 'category',
+    'Raum': 'category',
+    'Info': 'string[pyarrow]',
+    'Ausfall': 'bool',
+    'Selbststudium': 'bool',
+    'Ausfall-Fach': 'category',
+    'Ausfall-Lehrer': 'category',
+    'Klassenstufe': 'Int8',
+}
+
+# Spalten, in denen fehlende Werte als Leerstring gespeichert werden
+_TEXT_COLUMNS = [column for column, dtype in VERTRETUNGSPLAN_DTYPES.items()
+                 if dtype in ('category', 'string[pyarrow]')]
+
+
+def _as_text(values):
+    """Fehlende Werte (auch 'nan'/'None' aus früheren str-Konvertierungen) als ''."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(object)
+    values = values.fillna('').astype(str)
+    return values.replace({'nan': '', 'None': ''})
+
+
+def _as_bool(values):
+    if values.dtype == bool:
+        return values
+    return values.astype(str).str.lower().map({'true': True, 'false': False}).fillna(False).astype(bool)
+
+
+def apply_vertretungsplan_schema(df):
+    """
+    Bringt die Spalten eines Vertretungsplan-DataFrames auf VERTRETUNGSPLAN_DTYPES.
+
+    Bereits passende Spalten werden nicht angefasst; kategoriale Spalten nach einem
+    pd.concat (dort werden sie bei abweichenden Kategorien zu object) werden neu
+    kategorisiert.
+    """
+    for column, dtype in VERTRETUNGSPLAN_DTYPES.items():
+        if column not in df or df[column].dtype == dtype:
+            continue
+        if column in _TEXT_COLUMNS:
+            df[column] = _as_text(df[column]).astype(dtype)
+        elif dtype == 'Int8':
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype('Int8')
+        elif dtype == 'bool':
+            df[column] = _as_bool(df[column])
+        elif pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = df[column].astype(dtype)
+        else:
+            df[column] = pd.to_datetime(df[column]).astype(dtype)
+    return df
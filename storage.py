@@ -0,0 +1,162 @@
+import hashlib
+import logging
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from atomic import atomic_path
+from ids import first_occurrences, id_keys
+from schema import apply_vertretungsplan_schema
+
+# Spalten der Vertretungsplan-Daten mit ihren Arrow-Datentypen
+VERTRETUNGSPLAN_SCHEMA = pa.schema([
+    ('ID', pa.string()),
+    ('Datei', pa.string()),
+    ('Datum', pa.date32()),
+    ('Klasse', pa.dictionary(pa.int32(), pa.string())),
+    ('Stunde', pa.int64()),
+    ('Fach', pa.string()),
+    ('Lehrer', pa.string()),
+    ('Raum', pa.string()),
+    ('Info', pa.string()),
+    ('Ausfall', pa.bool_()),
+    ('Selbststudium', pa.bool_()),
+    ('Ausfall-Fach', pa.string()),
+    ('Ausfall-Lehrer', pa.string()),
+    ('Klassenstufe', pa.int64()),
+    ('ID-Key', pa.uint64()),
+])
+# uint64-Schlüssel der ID (ids.id_keys); wird mitgespeichert, damit beim Anhängen die
+# vorhandenen IDs nicht erneut gehasht werden müssen, und beim Laden wieder entfernt
+KEY_COLUMN = 'ID-Key'
+
+
+class ParquetStore:
+    """
+    Lokaler Spaltenspeicher für die Vertretungsplan-Daten.
+
+    Pro Schultag wird eine Parquet-Datei `<YYYY-MM-DD>.parquet` mit typisierten
+    Spalten abgelegt. Neue Datensätze werden tageweise angehängt, dabei werden
+    nur die betroffenen Tagesdateien gelesen und neu geschrieben.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _day_path(self, day):
+        return os.path.join(self.path, f'{day.isoformat()}.parquet')
+
+    def days(self):
+        """Liefert die Menge der gespeicherten Tage, ohne Dateien zu lesen."""
+        if not os.path.isdir(self.path):
+            return set()
+        result = set()
+        for name in os.listdir(self.path):
+            if name.endswith('.parquet'):
+                try:
+                    result.add(date.fromisoformat(name[:-len('.parquet')]))
+                except ValueError:
+                    continue
+        return result
+
+    def is_empty(self):
+        return not self.days()
+
+    def version(self):
+        """Versionsmarke aus Name, Größe und Änderungszeit der Tagesdateien (ohne sie zu lesen)."""
+        digest = hashlib.sha1()
+        for day in sorted(self.days()):
+            stat = os.stat(self._day_path(day))
+            digest.update(f'{day.isoformat()}:{stat.st_size}:{stat.st_mtime_ns};'.encode('utf-8'))
+        return f'parquet-{digest.hexdigest()[:16]}'
+
+    def load(self):
+        """Lädt alle gespeicherten Tage als DataFrame mit den App-Datentypen."""
+        files = [self._day_path(day) for day in sorted(self.days())]
+        if not files:
+            return pd.DataFrame()
+        table = pa.concat_tables([pq.read_table(f, schema=VERTRETUNGSPLAN_SCHEMA) for f in files])
+        return _table_to_frame(table)
+
+    def append(self, df):
+        """
+        Hängt neue Datensätze an und überspringt bereits gespeicherte IDs.
+
+        Rückgabe:
+        - Die tatsächlich neu gespeicherten Datensätze.
+        """
+        if df.empty:
+            return df
+        keys = id_keys(df['ID'])
+        first = first_occurrences(keys)
+        df, keys = df[first], keys[first]
+        os.makedirs(self.path, exist_ok=True)
+
+        new_parts = []
+        days = df.groupby(pd.to_datetime(df['Datum']).dt.date).indices
+        for day, positions in sorted(days.items()):
+            day_df, day_keys = df.iloc[positions], keys[positions]
+            day_path = self._day_path(day)
+            if os.path.exists(day_path):
+                existing = pq.read_table(day_path, schema=VERTRETUNGSPLAN_SCHEMA)
+                new = ~np.isin(day_keys, _table_keys(existing))
+                day_df, day_keys = day_df[new], day_keys[new]
+                if day_df.empty:
+                    continue
+                table = pa.concat_tables([_with_keys(existing),
+                                          _frame_to_table(day_df, day_keys)]).unify_dictionaries()
+            else:
+                table = _frame_to_table(day_df, day_keys)
+            _write_table(table, day_path)
+            new_parts.append(day_df)
+
+        if not new_parts:
+            logging.info('Keine neuen Daten für den lokalen Speicher.')
+            return df.iloc[0:0]
+        new_df = pd.concat(new_parts, ignore_index=True)
+        logging.info(f'{len(new_df)} neue Datensätze im lokalen Speicher abgelegt.')
+        return new_df
+
+
+def _table_keys(table):
+    """Schlüssel der Datensätze; ältere Tagesdateien ohne Schlüsselspalte werden gehasht."""
+    column = table.column(KEY_COLUMN)
+    if column.null_count:
+        return id_keys(table.column('ID').to_pandas())
+    return column.to_numpy()
+
+
+def _with_keys(table):
+    if not table.column(KEY_COLUMN).null_count:
+        return table
+    index = table.schema.get_field_index(KEY_COLUMN)
+    return table.set_column(index, KEY_COLUMN, pa.array(_table_keys(table), type=pa.uint64()))
+
+
+def _frame_to_table(df, keys):
+    frame = df.reindex(columns=VERTRETUNGSPLAN_SCHEMA.names).copy()
+    frame[KEY_COLUMN] = keys
+    frame['Datum'] = pd.to_datetime(frame['Datum']).dt.date
+    frame['Stunde'] = pd.to_numeric(frame['Stunde'], errors='coerce').astype('Int64')
+    frame['Klassenstufe'] = pd.to_numeric(frame['Klassenstufe'], errors='coerce').astype('Int64')
+    for column in ['Ausfall', 'Selbststudium']:
+        frame[column] = frame[column].astype(str).str.lower().eq('true')
+    for column in ['ID', 'Datei', 'Klasse', 'Fach', 'Lehrer', 'Raum', 'Info', 'Ausfall-Fach', 'Ausfall-Lehrer']:
+        frame[column] = frame[column].astype(object).fillna('').astype(str)
+    return pa.Table.from_pandas(frame, schema=VERTRETUNGSPLAN_SCHEMA, preserve_index=False)
+
+
+def _table_to_frame(table):
+    table = table.drop_columns([KEY_COLUMN])
+    df = table.to_pandas(date_as_object=False, types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+    df['Datum'] = df['Datum'].astype('datetime64[ns]')
+    return apply_vertretungsplan_schema(df)
+
+
+def _write_table(table, path):
+    with atomic_path(path) as tmp_path:
+        pq.write_table(table, tmp_path)
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+
+import numpy as np
+
+from atomic import atomic_path
+from ids import id_keys
+from xml_cache import CACHE_DIR
+
+
+class SyncIndex:
+    """
+    Lokaler Index der bereits in ein Tabellenblatt geschriebenen IDs.
+
+    Die IDs werden als sortiertes Array kompakter uint64-Schlüssel gehalten
+    (siehe ids.id_keys). Daneben werden die Anzahl der Datenzeilen, die zuletzt
+    geschriebene ID, die Spalte der IDs (z. B. 'A') und das jüngste synchronisierte
+    Datum (Hochwassermarke) gespeichert. So muss vor dem Anhängen nicht mehr das
+    ganze Tabellenblatt geladen werden.
+    """
+
+    def __init__(self, path, keys=None, row_count=0, last_id=None, max_datum=None, id_column='A'):
+        self.path = path
+        self.keys = np.unique(np.asarray(keys if keys is not None else [], dtype=np.uint64))
+        self.row_count = row_count
+        self.last_id = last_id
+        self.max_datum = max_datum
+        self.id_column = id_column
+
+    @property
+    def keys_path(self):
+        return self.path[:-len('.json')] + '.keys.npy'
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+            index = cls(path, None, state['row_count'], state.get('last_id'), state.get('max_datum'),
+                        state.get('id_column', 'A'))
+            with open(index.keys_path, 'rb') as f:
+                index.keys = np.load(f)
+        except (OSError, ValueError, KeyError):
+            return None
+        return index
+
+    def save(self):
+        with atomic_path(self.keys_path) as tmp_keys_path:
+            with open(tmp_keys_path, 'wb') as f:
+                np.save(f, self.keys)
+
+        state = {
+            'row_count': self.row_count,
+            'last_id': self.last_id,
+            'max_datum': self.max_datum,
+            'id_column': self.id_column,
+        }
+        with atomic_path(self.path) as tmp_path:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+
+    def contains(self, keys):
+        """Maske: welche der Schlüssel bereits synchronisiert sind."""
+        return np.isin(keys, self.keys)
+
+    def add(self, ids, max_datum=None, keys=None):
+        """
+        Vermerkt angehängte IDs (in Reihenfolge der Zeilen) und die neue Hochwassermarke.
+
+        Liegen die Schlüssel der IDs bereits vor (`keys`), werden sie übernommen statt
+        die IDs erneut zu hashen.
+        """
+        ids = list(ids)
+        if not ids:
+            return
+        self.keys = np.union1d(self.keys, id_keys(ids) if keys is None else np.asarray(keys, dtype=np.uint64))
+        self.row_count += len(ids)
+        self.last_id = ids[-1]
+        if max_datum is not None and (self.max_datum is None or max_datum > self.max_datum):
+            self.max_datum = max_datum
+
+
+def _index_path(key):
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, 'sync', f'{digest}.json')
+
+
+def _ends_with(worksheet, column, row_count, expected):
+    # Kleiner Bereichsabruf in der ID-Spalte: Zeile `row_count` + 1 (Zeile 1 ist die
+    # Kopfzeile) muss `expected` enthalten und die Zeile danach leer sein
+    last_row = row_count + 1
+    values = worksheet.get(f'{column}{last_row}:{column}{last_row + 1}')
+    cells = [row[0] if row else '' for row in values]
+    return cells == [expected]
+
+
+def _matches_worksheet(index, worksheet):
+    """Prüft, ob das Blatt seit dem letzten Sync unverändert endet."""
+    return _ends_with(worksheet, index.id_column, index.row_count, index.last_id if index.row_count else 'ID')
+
+
+def rows_appended(index, worksheet, ids):
+    """
+    Prüft nach einem Serverfehler beim Anhängen, ob die Zeilen mit `ids` trotzdem
+    geschrieben wurden (das Blatt endet dann mit der letzten dieser IDs).
+    """
+    return _ends_with(worksheet, index.id_column, index.row_count + len(ids), ids[-1])
+
+
+def _rebuild(path, worksheet):
+    """Baut den Index aus den Spalten 'ID' und 'Datum' des Tabellenblatts neu auf."""
+    from gspread.utils import rowcol_to_a1
+
+    logging.info('Sync-Index fehlt oder ist veraltet, wird aus Google Sheets neu aufgebaut.')
+    header = worksheet.row_values(1)
+    if 'ID' not in header:
+        return SyncIndex(path)
+
+    # Nur die benötigten Spalten ab Zeile 2 abrufen, z. B. 'A2:A' und 'C2:C'
+    letters = {column: rowcol_to_a1(1, header.index(column) + 1)[:-1]
+               for column in ['ID', 'Datum'] if column in header}
+    columns = worksheet.batch_get([f'{letter}2:{letter}' for letter in letters.values()])
+
+    ids = [row[0] if row else '' for row in columns[0]]
+    max_datum = None
+    if len(columns) > 1:
+        datums = []
+        for row in columns[1]:
+            try:
+                datums.append(datetime.strptime(row[0], '%d.%m.%Y').strftime('%Y-%m-%d'))
+            except (IndexError, ValueError):
+                continue
+        max_datum = max(datums) if datums else None
+
+    return SyncIndex(path, id_keys(ids), len(ids), ids[-1] if ids else None, max_datum, letters['ID'])
+
+
+def load_for_worksheet(worksheet, key):
+    """
+    Lädt den Sync-Index für ein Tabellenblatt.
+
+    Ist kein Index vorhanden oder wurde das Blatt zwischenzeitlich anderweitig
+    verändert, wird der Index aus der ID-Spalte neu aufgebaut.
+    """
+    path = _index_path(key)
+    index = SyncIndex.load(path)
+    if index is None or not _matches_worksheet(index, worksheet):
+        index = _rebuild(path, worksheet)
+        index.save()
+    return index
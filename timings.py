@@ -0,0 +1,31 @@
+import time
+from contextlib import contextmanager
+
+
+class StageTimings:
+    """
+    Laufzeiten der einzelnen Verarbeitungsschritte eines Laufs, in Sekunden.
+
+    Verschachtelte Schritte (z. B. das Warten auf einen Abruf, während der Parser
+    den nächsten Tag anfordert) zählen nur beim inneren Schritt.
+    """
+
+    def __init__(self):
+        self.seconds = {}
+        self._nested = []
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        self._nested.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            inner = self._nested.pop()
+            self.seconds[name] = self.seconds.get(name, 0.0) + elapsed - inner
+            if self._nested:
+                self._nested[-1] += elapsed
+
+    def summary(self):
+        return ', '.join(f'{name} {seconds:.2f} s' for name, seconds in self.seconds.items())
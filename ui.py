@@ -0,0 +1,66 @@
+import contextvars
+import logging
+import math
+
+import streamlit as st
+
+# Zeilen pro Seite in Tabellenansichten
+PAGE_SIZE = 500
+
+_payload_counter = contextvars.ContextVar('payload_bytes', default=None)
+
+
+def start_payload_count():
+    """
+    Startet die Messung der an den Browser gesendeten Daten für den aktuellen Seitendurchlauf.
+
+    Rückgabe:
+    - Ein Dict, dessen Einträge 'bytes' und 'elements' laufend hochgezählt werden.
+    """
+    counter = {'bytes': 0, 'elements': 0}
+    _payload_counter.set(counter)
+    return counter
+
+
+def log_payload_count(counter):
+    logging.info(f"An den Browser gesendet in diesem Durchlauf: {counter['bytes'] / 1024:.1f} KB "
+                 f"in {counter['elements']} Tabellen/Diagrammen")
+
+
+def _count(nbytes):
+    counter = _payload_counter.get()
+    if counter is not None:
+        counter['bytes'] += nbytes
+        counter['elements'] += 1
+
+
+def _arrow_size(df):
+    # Streamlit überträgt Tabellen als Arrow-IPC-Stream
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().size
+
+
+def dataframe(df, key, page_size=PAGE_SIZE, **kwargs):
+    """
+    Zeigt `df` seitenweise an: an den Browser geht nur die gewählte Seite mit
+    höchstens `page_size` Zeilen statt der ganzen Tabelle.
+    """
+    if len(df) > page_size:
+        pages = math.ceil(len(df) / page_size)
+        page = st.number_input(f'Seite (von {pages})', min_value=1, max_value=pages, value=1, step=1, key=key)
+        start = (page - 1) * page_size
+        df = df.iloc[start:start + page_size]
+        st.caption(f'Zeilen {start + 1} bis {start + len(df)}')
+    _count(_arrow_size(df))
+    st.dataframe(df, **kwargs)
+
+
+def altair_chart(chart, **kwargs):
+    """st.altair_chart mit Messung der Größe der Vega-Lite-Spezifikation (inkl. Daten)."""
+    _count(len(chart.to_json(validate=False, indent=None).encode('utf-8')))
+    st.altair_chart(chart, **kwargs)
@@ -0,0 +1,372 @@
+import logging
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+import cache
+from ids import HASH64, content_keys, first_occurrences, id_keys, make_ids
+from kalenderwochen import generate_year_week_pairs
+from klassen import klassenstufe_series
+from rollups import weekly_rollup
+
+# Spalten der "vergleich"-Tabellenblätter
+VERGLEICH_HEADER = ["ID", "Schuljahr", "Jahr", "KW", "Klasse", "Fach", "Klassenstufe", "Soll", "Ist", "Delta", "Keine-Daten"]
+
+# Schlüssel, über die Ausfallstunden und Soll-Stunden zusammengeführt werden
+GRP_COLS = ['Schuljahr', 'Jahr', 'KW', 'Klasse', 'Ausfall-Fach', 'Klassenstufe']
+
+
+def build_vergleich_frame(schuljahr, jahr_start, kw_start, jahr_ende, kw_ende, klassen_liste, df_soll):
+    """
+    Erzeugt die Vergleichszeilen eines Schuljahres in einem Durchgang.
+
+    Statt Wochen × Klassen × Fächer in Schleifen zu durchlaufen, wird die Soll-Tabelle
+    (eine Zeile pro Klassenstufe, eine Spalte pro Fach) ins Langformat gebracht,
+    auf Soll != 0 gefiltert, mit den Klassen verknüpft und per Cross Join auf alle
+    (Jahr, KW)-Paare verteilt.
+
+    Rückgabe:
+    - DataFrame mit den Spalten VERGLEICH_HEADER (Ist=0, Delta=0, Keine-Daten='True')
+    """
+    # Alle (jahr, kw) Paare generieren
+    weeks = pd.DataFrame(generate_year_week_pairs(jahr_start, kw_start, jahr_ende, kw_ende), columns=['Jahr', 'KW'])
+
+    klassen = pd.DataFrame({'Klasse': klassen_liste})
+    klassen['Klassenstufe'] = klassenstufe_series(klassen['Klasse'])
+    for klasse in klassen.loc[klassen['Klassenstufe'].isna(), 'Klasse']:
+        logging.warning(f"Keine Klassenstufe für Klasse '{klasse}' extrahierbar.")
+    klassen = klassen.dropna(subset=['Klassenstufe'])
+
+    # Soll-Tabelle ins Langformat: eine Zeile pro (Klassenstufe, Fach), nur Soll != 0
+    df_soll = df_soll.copy()
+    df_soll['Klassenstufe'] = pd.to_numeric(df_soll['Klassenstufe'], errors='coerce').astype('Int64')
+    df_soll = df_soll.dropna(subset=['Klassenstufe']).drop_duplicates(subset=['Klassenstufe'], keep='first')
+    soll_long = df_soll.melt(id_vars=['Klassenstufe'], var_name='Fach', value_name='Soll')
+    soll_long = soll_long[soll_long['Soll'] != 0]
+
+    for klassenstufe in sorted(set(klassen['Klassenstufe']) - set(df_soll['Klassenstufe'])):
+        logging.warning(f"Keine Soll-Daten für Klassenstufe {klassenstufe} im Schuljahr {schuljahr}.")
+
+    # Klassen × Fächer, dann × Wochen
+    klassen_faecher = klassen.merge(soll_long, on='Klassenstufe', how='inner')
+    frame = weeks.merge(klassen_faecher, how='cross')
+
+    frame.insert(0, 'Schuljahr', schuljahr)
+    frame['Ist'] = 0
+    frame['Delta'] = 0
+    frame['Keine-Daten'] = 'True'
+    # Die IDs dienen nur der Zuordnung innerhalb der Vergleichsblätter, die immer vollständig
+    # neu geschrieben werden; daher der vektorisierte Hash statt MD5 pro Zeile
+    frame.insert(0, 'ID', make_ids([frame['Schuljahr'], frame['Jahr'], frame['KW'], frame['Klasse'], frame['Fach']],
+                                   mode=HASH64))
+    return frame[VERGLEICH_HEADER]
+
+
+def _iso_weeks(datum):
+    """ISO-Jahr und -Woche zu einer Datumsspalte; isocalendar läuft nur einmal pro Tag."""
+    codes, tage = pd.factorize(datum)
+    iso_cal = pd.DatetimeIndex(tage).isocalendar()
+    jahr = iso_cal['year'].array.take(codes, allow_fill=True)
+    kw = iso_cal['week'].array.take(codes, allow_fill=True)
+    return jahr, kw
+
+
+def _prepare_vergleich(vergleich_df):
+    vergleich_df['Schuljahr'] = vergleich_df['Schuljahr'].astype(str)
+    vergleich_df['Klassenstufe'] = pd.to_numeric(vergleich_df['Klassenstufe'], errors='coerce').astype('Int64', errors='ignore')
+    vergleich_df['Ausfall-Fach'] = vergleich_df['Fach'].astype(str).str.strip()
+    vergleich_df['Klasse'] = vergleich_df['Klasse'].astype(str).str.strip()
+    return vergleich_df
+
+
+class Schuljahre:
+    """
+    Zeiträume der Schuljahre laut Tabellenblatt 'schuljahr' (Montag der Startwoche
+    bis Sonntag der Endwoche), um Vertretungsplan-Datensätze über ihr Datum dem
+    richtigen Schuljahr zuzuordnen.
+    """
+
+    def __init__(self, df_schuljahr):
+        intervals = []
+        for row in df_schuljahr.to_dict('records'):
+            start = date.fromisocalendar(int(row['Jahr-Start']), int(row['KW-Start']), 1)
+            end = date.fromisocalendar(int(row['Jahr-Ende']), int(row['KW-Ende']), 7) + timedelta(days=1)
+            intervals.append((start, end, str(row['Schuljahr'])))
+        intervals.sort()
+        # Ein Schuljahr kann in mehreren Zeilen stehen (z. B. mit verschiedenen Klassenlisten)
+        self.namen = list(dict.fromkeys(name for _, _, name in intervals))
+        self.key = tuple(intervals)
+        self._starts = np.array([start for start, _, _ in intervals], dtype='datetime64[ns]')
+        self._ends = np.array([end for _, end, _ in intervals], dtype='datetime64[ns]')
+        self._codes = np.array([self.namen.index(name) for _, _, name in intervals], dtype=np.int64)
+
+    def __str__(self):
+        return ', '.join(self.namen)
+
+    def assign(self, datum):
+        """
+        Schuljahr zu jedem Datum als Categorical; Daten außerhalb aller Schuljahre
+        erhalten NaN. Die Intervallsuche (searchsorted auf den sortierten Startdaten)
+        läuft nur einmal pro Tag.
+        """
+        codes, tage = pd.factorize(datum)
+        tage = np.asarray(tage, dtype='datetime64[ns]')
+        day_codes = np.full(len(tage), -1, dtype=np.int64)
+        if len(self._starts):
+            pos = np.searchsorted(self._starts, tage, side='right') - 1
+            inside = (pos >= 0) & (tage < self._ends[np.maximum(pos, 0)])
+            day_codes[inside] = self._codes[pos[inside]]
+        row_codes = np.where(codes >= 0, day_codes.take(np.maximum(codes, 0)), -1)
+        return pd.Categorical.from_codes(row_codes, categories=self.namen)
+
+
+def _prepare_vp(vp_df, schuljahr):
+    vp_df = vp_df.copy()
+    if isinstance(schuljahr, Schuljahre):
+        vp_df['Schuljahr'] = schuljahr.assign(vp_df['Datum'])
+    else:
+        vp_df['Schuljahr'] = schuljahr
+    vp_df['Klassenstufe'] = pd.to_numeric(vp_df['Klassenstufe'], errors='coerce').astype('Int64', errors='ignore')
+    vp_df['Ausfall-Fach'] = _strip_categorical(vp_df['Ausfall-Fach'])
+    vp_df['Klasse'] = _strip_categorical(vp_df['Klasse'])
+    if 'Jahr' not in vp_df or 'KW' not in vp_df:
+        vp_df['Jahr'], vp_df['KW'] = _iso_weeks(vp_df['Datum'])
+    return vp_df
+
+
+def _strip_categorical(values):
+    """
+    Wie `values.astype(str).str.strip()`, aber als Categorical: gestrippt wird
+    nur einmal pro eindeutigem Wert.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    stripped = pd.Index(uniques).astype(str).str.strip()
+    # Werte, die erst nach dem Strippen gleich sind, zusammenlegen
+    stripped_codes, categories = pd.factorize(stripped)
+    return pd.Categorical.from_codes(stripped_codes.take(codes), categories=categories)
+
+
+def _count_ausfall(vp_df):
+    """Zählt die Ausfallstunden (Ausfall=True) pro GRP_COLS."""
+    # Nur Zeilen mit Ausfall gruppieren; Gruppen ohne Ausfall ergeben beim Merge ohnehin 0
+    ausfall = vp_df[vp_df['Ausfall'].eq(True).to_numpy()]
+    keys = [ausfall[c].astype('category') if ausfall[c].dtype == object else ausfall[c] for c in GRP_COLS]
+    counts = ausfall.groupby(keys, observed=True, sort=False).size()
+    vp_group = counts.reset_index(name='ausfall_count')
+    # Kategorien wieder als Strings, damit der Merge mit den Vergleichszeilen wie bisher funktioniert
+    for column in ['Schuljahr', 'Klasse', 'Ausfall-Fach']:
+        vp_group[column] = vp_group[column].astype(str)
+    return vp_group
+
+
+def _merge_ist_delta(vergleich_df, vp_group):
+    merged = pd.merge(vergleich_df, vp_group, on=GRP_COLS, how='left')
+    merged['ausfall_count'] = merged['ausfall_count'].fillna(0).astype(int)
+
+    # Ist = Soll - ausfall_count, Delta = ausfall_count
+    merged['Ist'] = merged['Soll'] - merged['ausfall_count']
+    merged['Delta'] = merged['ausfall_count']
+    merged['Keine-Daten'] = False
+    return merged
+
+
+def _ohne_daten(vergleich_df):
+    # Ohne Vertretungsplan-Daten gibt es keine Ist-Werte: Ist=Soll, Delta=0
+    vergleich_df['Ist'] = vergleich_df['Soll']
+    vergleich_df['Delta'] = 0
+    return vergleich_df
+
+
+def calculate_ist_delta(vergleich_df, vp_df, schuljahr):
+    """
+    Berechnet Ist- und Delta-Werte auf Basis der Ausfalldaten (vollständige Neuberechnung).
+    Logik:
+    - Gruppiere vp_df nach (Schuljahr, Jahr, KW, Klasse, Fach, Klassenstufe), zähle Ausfallstunden (Ausfall=True).
+    - Ist = Soll - Ausfall_count
+    - Delta = Ausfall_count
+    - Wenn Ausfall_count=0 => Ist=Soll, Delta=0
+    - Zurückgegeben werden nur die (Jahr, KW), die in vp_df vorkommen.
+
+    Parameter:
+    - vergleich_df: Enthält Spalten [Schuljahr, Jahr, KW, Klasse, Fach, Klassenstufe, Soll]
+    - vp_df: Enthält Vertretungsplan-Daten mit 'Ausfall' (bool), 'Klasse', 'Ausfall-Fach', 'Klassenstufe', 'Datum'
+    - schuljahr: String, z. B. "2024/25" (alle Datensätze gehören zu diesem Schuljahr),
+      oder Schuljahre, dann wird jeder Datensatz über sein Datum zugeordnet
+
+    Rückgabe:
+    - Ein DataFrame mit zusätzlichen Spalten Ist und Delta.
+    """
+    # Duplikate entfernen
+    vp_df = vp_df[first_occurrences(id_keys(vp_df['ID']))] if len(vp_df) else vp_df
+    vergleich_df = _prepare_vergleich(vergleich_df)
+    if vp_df.empty:
+        return _ohne_daten(vergleich_df)
+    vp_df = _prepare_vp(vp_df, schuljahr)
+
+    df_dates = vp_df[['Jahr', 'KW']].dropna().drop_duplicates().astype(int).sort_values(by=['Jahr', 'KW'])
+    merged = _merge_ist_delta(vergleich_df, _count_ausfall(vp_df))
+    # Nur die (Jahr, KW) behalten, die auch in vp_df vorkommen
+    return pd.merge(merged, df_dates, on=['Jahr', 'KW'], how='inner')
+
+
+class IstDeltaPartitions:
+    """
+    Inkrementelle Variante von calculate_ist_delta für ein Schuljahr (String)
+    oder mehrere Schuljahre (Schuljahre).
+
+    Pro (Jahr, KW) werden die gezählten Ausfallstunden (`ausfall_count`) und das
+    fertig zusammengeführte Ergebnis gehalten. Bei neuen Vertretungsplan-Daten
+    werden nur die Wochen neu gezählt und gemergt, deren Datensätze sich geändert
+    haben; ein tägliches Update betrifft damit eine Woche statt des ganzen Jahres.
+
+    Eine Woche gilt als geändert, wenn sich ihr Fingerabdruck (Anzahl Datensätze und
+    Summe der Inhaltsschlüssel aus ID, Ausfall, Ausfall-Fach und Klasse, siehe
+    ids.content_keys) geändert hat; so fällt auch ein korrigierter Datensatz bei
+    gleicher Anzahl auf. Da die ID das Datum enthält, liegen Duplikate immer in
+    derselben Woche und werden dort entfernt.
+    """
+
+    def __init__(self, schuljahr):
+        self.schuljahr = schuljahr
+        self.lock = threading.Lock()
+        self.vergleich_key = None
+        self.vergleich_weeks = {}  # (Jahr, KW) -> Vergleichszeilen
+        self.vergleich_empty = None
+        self.fingerprints = {}     # (Jahr, KW) -> (Anzahl, Schlüsselsumme) der Datensätze im vp_df
+        self.counts = {}           # (Jahr, KW) -> ausfall_count-Partition
+        self.merged = {}           # (Jahr, KW) -> Ergebnis der Woche
+        self.rollups = {}          # ((Jahr, KW), 'Fach'|'Klasse') -> Wochen-Rollup
+        self.vp_key = None
+        self.result_cache = None
+
+    def set_vergleich(self, vergleich_df, key=None):
+        """
+        Setzt die Vergleichszeilen. Bei unverändertem `key` (Versionsmarke, siehe
+        cache.version_of) bleiben alle Wochenergebnisse erhalten.
+        """
+        if key is None:
+            key = cache.version_of(vergleich_df)
+        if key == self.vergleich_key:
+            return
+        self.result_cache = None
+        vergleich_df = _prepare_vergleich(vergleich_df.copy())
+        self.vergleich_weeks = {(int(jahr), int(kw)): part
+                                for (jahr, kw), part in vergleich_df.groupby(['Jahr', 'KW'], sort=False)}
+        self.vergleich_empty = vergleich_df.iloc[0:0]
+        self.vergleich_key = key
+        self.merged, self.rollups = {}, {}
+
+    def update(self, vp_df, key=None):
+        """
+        Gleicht die Partitionen mit dem aktuellen Vertretungsplan ab. Bei
+        unverändertem `key` (Versionsmarke des vp_df) ist nichts zu tun.
+
+        Rückgabe:
+        - Liste der neu berechneten (Jahr, KW)
+        """
+        if key is not None and key == self.vp_key:
+            return []
+        self.vp_key = key
+        self.result_cache = None
+        if vp_df.empty:
+            changed = list(self.fingerprints)
+            self.fingerprints, self.counts, self.merged, self.rollups = {}, {}, {}, {}
+            return changed
+
+        jahr, kw = _iso_weeks(vp_df['Datum'])
+        weeks = pd.DataFrame({'Jahr': jahr, 'KW': kw, 'key': content_keys(vp_df)}).dropna()
+        fingerprints = {(int(j), int(k)): (int(n), int(total))
+                        for (j, k), n, total in weeks.groupby(['Jahr', 'KW'])['key'].agg(['size', 'sum'])
+                        .itertuples(name=None)}
+
+        changed = [week for week, fp in fingerprints.items() if self.fingerprints.get(week) != fp]
+        for week in set(self.fingerprints) - set(fingerprints):
+            self.counts.pop(week, None)
+            self._drop_week(week)
+
+        if changed:
+            mask = pd.MultiIndex.from_arrays([jahr, kw]).isin(changed)
+            part = vp_df[mask].copy()
+            part['Jahr'], part['KW'] = jahr[mask], kw[mask]
+            part = part[first_occurrences(id_keys(part['ID']))]
+            part = _prepare_vp(part, self.schuljahr)
+            vp_group = _count_ausfall(part)
+            groups = dict(iter(vp_group.groupby(['Jahr', 'KW'], sort=False)))
+            for week in changed:
+                self.counts[week] = groups.get(week, vp_group.iloc[0:0])
+                self._drop_week(week)
+            logging.info(f"Ist/Delta {self.schuljahr}: {len(changed)} von {len(fingerprints)} Wochen neu berechnet.")
+
+        self.fingerprints = fingerprints
+        return changed
+
+    def result(self):
+        """Setzt das Ergebnis aus den Wochenergebnissen zusammen (wie calculate_ist_delta)."""
+        if self.result_cache is None:
+            self.result_cache = self._assemble()
+        return self.result_cache.copy()
+
+    def rollup(self, by):
+        """
+        Soll/Ist/Delta pro Woche und `by` ('Fach' oder 'Klasse') zum aktuellen Ergebnis.
+
+        Die Rollups werden pro Woche gehalten und nur für geänderte Wochen neu
+        gebildet; Diagramme lesen damit wenige hundert Zeilen statt aller Vergleichszeilen.
+        """
+        with self.lock:
+            if not self.fingerprints:
+                return weekly_rollup(self._assemble(), by)
+            self._merge_weeks()
+            parts = []
+            for week in sorted(self.fingerprints):
+                if (week, by) not in self.rollups:
+                    self.rollups[(week, by)] = weekly_rollup(self.merged[week], by)
+                parts.append(self.rollups[(week, by)])
+            return pd.concat(parts, ignore_index=True)
+
+    def _drop_week(self, week):
+        self.merged.pop(week, None)
+        for by in ('Fach', 'Klasse'):
+            self.rollups.pop((week, by), None)
+
+    def _merge_weeks(self):
+        for week in self.fingerprints:
+            if week not in self.merged:
+                vergleich_week = self.vergleich_weeks.get(week, self.vergleich_empty)
+                self.merged[week] = _merge_ist_delta(vergleich_week, self.counts[week])
+
+    def _assemble(self):
+        if not self.fingerprints:
+            frames = list(self.vergleich_weeks.values())
+            vergleich_df = pd.concat(frames) if frames else self.vergleich_empty.copy()
+            return _ohne_daten(vergleich_df)
+
+        self._merge_weeks()
+        return pd.concat([self.merged[week] for week in sorted(self.fingerprints)], ignore_index=True)
+
+    def ist_delta(self, vergleich_df, vp_df, vergleich_key=None, vp_key=None):
+        """
+        set_vergleich + update + result in einem Aufruf.
+
+        Mit den Versionsmarken beider DataFrames (cache.version_of) ist ein
+        erneuter Aufruf mit unveränderten Daten ein reiner Nachschlag.
+        """
+        with self.lock:
+            self.set_vergleich(vergleich_df, vergleich_key)
+            self.update(vp_df, vp_key)
+            return self.result()
+
+
+_partitions = {}
+_partitions_lock = threading.Lock()
+
+
+def get_ist_delta_partitions(schuljahr):
+    """Liefert die prozessweit geteilten IstDeltaPartitions eines Schuljahres bzw. von Schuljahre."""
+    key = schuljahr.key if isinstance(schuljahr, Schuljahre) else schuljahr
+    with _partitions_lock:
+        if key not in _partitions:
+            _partitions[key] = IstDeltaPartitions(schuljahr)
+        return _partitions[key]
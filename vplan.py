@@ -0,0 +1,173 @@
+"""
+Kommandozeile für die Verarbeitung ohne Streamlit, z. B. nächtlich per cron:
+
+    python -m vplan ingest                                # fehlende Schultage nachladen
+    python -m vplan ingest --from 2024-09-09 --to 2024-09-13
+    python -m vplan ingest --loop --interval 3600         # dauerhaft als eigener Prozess
+    python -m vplan recompute-vergleich [--schuljahr 2024-25] [--init]
+    python -m vplan export --output vertretungsplan.csv [--from ...] [--to ...]
+    python -m vplan export --gsheet                       # fehlende Datensätze nach Google Sheets
+
+Die Konfiguration wird aus .streamlit/secrets.toml gelesen (siehe config.py).
+Am Ende jedes Befehls werden die Laufzeiten der einzelnen Schritte ausgegeben.
+"""
+import argparse
+import logging
+import sys
+import threading
+from datetime import date
+
+import pandas as pd
+
+import ingest
+from backfill import load_school_calendar
+from timings import StageTimings
+from vergleich import Schuljahre, calculate_ist_delta
+from vplan_data import (
+    init_vergleich_tables,
+    load_schuljahre,
+    load_vergleich_for_schuljahre,
+    load_vertretungsplan_data,
+    save_to_gsheet,
+    save_vergleich,
+)
+
+# Rückgabewert, wenn bereits ein anderer Prozess ingestiert (EX_TEMPFAIL)
+EXIT_LOCKED = 75
+
+
+def days_between(start, end):
+    """Schultage (YYYYMMDD) zwischen `start` und `end` laut Schulkalender, ohne Kalender alle Wochentage."""
+    days = pd.bdate_range(start, end).date
+    calendar = load_school_calendar()
+    if calendar:
+        days = [day for day in days if day in calendar]
+    return [day.strftime('%Y%m%d') for day in days]
+
+
+def cmd_ingest(args, timings):
+    if args.loop:
+        ingest.run_worker(args.interval, threading.Event())
+        return 0
+    datum_strs = None
+    if args.date_from or args.date_to:
+        with timings.stage('kalender'):
+            datum_strs = days_between(args.date_from or args.date_to, args.date_to or date.today())
+    new_rows = ingest.run_ingestion(datum_strs, force=args.force, timings=timings)
+    if new_rows is None:
+        return EXIT_LOCKED
+    print(f'{new_rows} neue Datensätze gespeichert.')
+    return 0
+
+
+def cmd_recompute_vergleich(args, timings):
+    if args.init:
+        with timings.stage('initialisieren'):
+            init_vergleich_tables()
+    with timings.stage('vergleich laden'):
+        schuljahre = Schuljahre(load_schuljahre())
+        namen = [args.schuljahr] if args.schuljahr else schuljahre.namen
+        vergleich_df = load_vergleich_for_schuljahre(namen)
+    if vergleich_df.empty:
+        print(f"Keine Vergleichsdaten für {', '.join(namen)}.")
+        return 0
+    with timings.stage('vertretungsplan laden'):
+        vp_df = load_vertretungsplan_data()
+    with timings.stage('ist/delta'):
+        # Datensätze über ihr Datum dem Schuljahr zuordnen
+        result = calculate_ist_delta(vergleich_df.copy(), vp_df, schuljahre)
+
+    with timings.stage('schreiben'):
+        # Ist/Delta der berechneten Wochen übernehmen, übrige Zeilen bleiben unverändert
+        columns = ['Ist', 'Delta', 'Keine-Daten']
+        computed = result.set_index('ID')[columns]
+        pos = computed.index.get_indexer(vergleich_df['ID'])
+        found = pos >= 0
+        for column in columns:
+            vergleich_df.loc[found, column] = computed[column].to_numpy()[pos[found]]
+        for schuljahr, rows in vergleich_df.groupby(vergleich_df['Schuljahr'].astype(str), sort=False):
+            save_vergleich(schuljahr, rows)
+            print(f'Ist/Delta für {int(found[rows.index].sum())} von {len(rows)} Zeilen '
+                  f'in vergleich-{schuljahr} geschrieben.')
+    return 0
+
+
+def cmd_export(args, timings):
+    with timings.stage('laden'):
+        df = load_vertretungsplan_data()
+        if df.empty:
+            print('Keine Vertretungsplan-Daten gespeichert, nichts zu exportieren.')
+            return 0
+        if args.date_from:
+            df = df[df['Datum'] >= pd.Timestamp(args.date_from)]
+        if args.date_to:
+            df = df[df['Datum'] <= pd.Timestamp(args.date_to)]
+    result = 0
+    if args.gsheet:
+        # Nicht gleichzeitig mit einem Ingest, der ebenfalls nach Google Sheets exportiert
+        # und den Sync-Index fortschreibt
+        with ingest.IngestLock() as locked, timings.stage('google sheets'):
+            if locked:
+                new_df = save_to_gsheet(df)
+        if locked:
+            print(f'{len(new_df)} Datensätze nach Google Sheets exportiert.')
+        else:
+            print('Ingest läuft gerade, Export nach Google Sheets übersprungen.')
+            result = EXIT_LOCKED
+    if args.output:
+        with timings.stage('datei'):
+            if args.output.endswith('.parquet'):
+                df.to_parquet(args.output, index=False)
+            else:
+                df.to_csv(args.output, index=False)
+        print(f'{len(df)} Datensätze nach {args.output} exportiert.')
+    return result
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m vplan', description='Vertretungsplan-Daten ohne Streamlit verarbeiten.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('ingest', help='Vertretungspläne abrufen, parsen und speichern')
+    p.add_argument('--from', dest='date_from', type=date.fromisoformat, metavar='YYYY-MM-DD')
+    p.add_argument('--to', dest='date_to', type=date.fromisoformat, metavar='YYYY-MM-DD')
+    p.add_argument('--force', action='store_true',
+                   help='die Woche bis zum letzten Schultag auch dann erneut prüfen, wenn sie gespeichert ist')
+    p.add_argument('--loop', action='store_true', help='dauerhaft im Abstand von --interval laufen')
+    p.add_argument('--interval', type=int, default=ingest.DEFAULT_INTERVAL, help='Sekunden zwischen zwei Läufen')
+    p.set_defaults(func=cmd_ingest)
+
+    p = commands.add_parser('recompute-vergleich', help='Ist/Delta berechnen und in die Vergleich-Tabellen schreiben')
+    p.add_argument('--schuljahr', help='nur dieses Schuljahr, z. B. 2024-25 (Standard: alle)')
+    p.add_argument('--init', action='store_true', help='Vergleich-Tabellen vorher neu erzeugen')
+    p.set_defaults(func=cmd_recompute_vergleich)
+
+    p = commands.add_parser('export', help='gespeicherte Vertretungsplan-Daten exportieren')
+    p.add_argument('--output', help='Zieldatei (.csv oder .parquet)')
+    p.add_argument('--gsheet', action='store_true', help='fehlende Datensätze nach Google Sheets schreiben')
+    p.add_argument('--from', dest='date_from', type=date.fromisoformat, metavar='YYYY-MM-DD')
+    p.add_argument('--to', dest='date_to', type=date.fromisoformat, metavar='YYYY-MM-DD')
+    p.set_defaults(func=cmd_export)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'export' and not (args.output or args.gsheet):
+        parser.error('export benötigt --output und/oder --gsheet')
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    timings = StageTimings()
+    try:
+        return args.func(args, timings)
+    except Exception:
+        logging.exception(f'{args.command} fehlgeschlagen.')
+        return 1
+    finally:
+        if timings.seconds:
+            print(f'Laufzeiten: {timings.summary()}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
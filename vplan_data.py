@@ -0,0 +1,408 @@
+import contextvars
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import cache
+import gsheet
+from bulk_writer import with_retry, write_worksheet
+import sync_index
+from config import get_secrets
+from ids import first_occurrences, id_keys
+from klassen import klassenstufe_series
+from schema import apply_vertretungsplan_schema
+from rollups import DailyRollupStore, daily_rollup
+from vergleich import VERGLEICH_HEADER, build_vergleich_frame
+
+# Laden und Speichern der Daten ohne Streamlit, damit auch der Hintergrund-Ingest
+# (ingest.py) und die Kommandozeile (vplan.py) dieselben Wege nutzen. Konfiguration über config.get_secrets().
+
+# Höchstzahl gleichzeitig geladener Vergleich-Tabellenblätter
+MAX_SHEET_WORKERS = 4
+
+
+def get_gsheet_connection():
+    """Liefert die prozessweit geteilte Google-Sheets-Verbindung."""
+    return gsheet.get_connection(get_secrets()["connections"]["gsheets"]["credentials"])
+
+
+def gsheet_source_configured():
+    """True, wenn ein Tabellenblatt für die Vertretungsplan-Daten konfiguriert ist."""
+    return "vertretungsplan_data" in get_secrets().get("connections", {}).get("gsheets", {})
+
+
+def convert_vertretungsplan_types(df):
+    """Konvertiert die Spalten der Vertretungsplan-Daten in die Datentypen aus schema.py."""
+    # 'Datum' Spalte in datetime64
+    df['Datum'] = pd.to_datetime(df['Datum'], format='%d.%m.%Y', errors='coerce')
+
+    # **Erstellen der 'Klassenstufe'-Spalte**
+    df['Klassenstufe'] = klassenstufe_series(df['Klasse'])
+
+    # Stunde als Int8, Ausfall/Selbststudium als bool (fehlende Werte als False),
+    # wenig verschiedene Texte kategorial, ID und Info als Arrow-Strings
+    df = apply_vertretungsplan_schema(df)
+
+    # Entfernen von Zeilen mit ungültigen Datumswerten
+    df = df.dropna(subset=['Datum'])
+
+    return df
+
+
+@cache.cached('vertretungsplan', ttl=3600)
+def load_vertretungsplan_data_from_gsheet():
+    # Google Sheets API initialisieren
+    worksheet = get_gsheet_connection().worksheet(get_secrets()["connections"]["gsheets"]["vertretungsplan_data"])
+
+    # Daten aus Google Sheets laden
+    data = worksheet.get_all_records()
+    if data:
+        df = pd.DataFrame(data)
+    else:
+        df = pd.DataFrame()
+
+    if not df.empty:
+        df = convert_vertretungsplan_types(df)
+
+    # Versionsmarke für abhängige Caches (Filter, Ist/Delta)
+    return cache.set_version(df)
+
+
+def _ensure_header(worksheet, header):
+    """
+    Schreibt die Spaltenüberschriften in ein leeres Tabellenblatt.
+
+    Ein Sync-Index ohne Zeilen entsteht auch, wenn die Kopfzeile keine Spalte 'ID'
+    enthält. Das Blatt wird deshalb nur beschrieben, wenn es tatsächlich leer ist;
+    vorhandene Inhalte werden nie gelöscht.
+    """
+    if worksheet.row_values(1) == header:
+        return
+    if worksheet.get_all_values():
+        raise RuntimeError(f"Tabellenblatt '{worksheet.title}' ist nicht leer, hat aber keine passende Kopfzeile "
+                           f"(erwartet: {', '.join(header)}); bitte manuell prüfen.")
+    worksheet.append_row(header)
+
+
+# Funktion zum Speichern der Daten in Google Sheets
+def save_to_gsheet(df):
+    """
+    Hängt neue Datensätze an das Tabellenblatt an.
+
+    Welche IDs bereits gespeichert sind, wird dem lokalen Sync-Index entnommen,
+    sodass nur das Delta gelesen und geschrieben wird.
+
+    Rückgabe:
+    - Die tatsächlich angehängten Datensätze (mit den ursprünglichen Datentypen).
+    """
+    # Google Sheets API initialisieren
+    sheet_url = get_secrets()["connections"]["gsheets"]["vertretungsplan_data"]
+    worksheet = get_gsheet_connection().worksheet(sheet_url)
+
+    # Bereits gespeicherte IDs aus dem Sync-Index
+    index = sync_index.load_for_worksheet(worksheet, sheet_url)
+
+    # Duplikate entfernen (auf kompakten uint64-Schlüsseln statt auf ID-Strings)
+    keys = id_keys(df['ID'])
+    first = first_occurrences(keys)
+    df = df[first]
+    keys = keys[first]
+
+    if index.row_count == 0:
+        _ensure_header(worksheet, df.columns.tolist())
+
+    # Neue Datensätze identifizieren
+    new = ~index.contains(keys)
+    new_df = df[new]
+
+    if not new_df.empty:
+        rows_df = new_df.copy()
+        # Konvertieren Sie die 'Datum'-Spalte in String
+        rows_df['Datum'] = rows_df['Datum'].dt.strftime('%d.%m.%Y')
+
+        # Konvertieren Sie alle Spalten in Strings
+        rows_df = rows_df.astype(str)
+
+        # Neue Daten in Listen umwandeln
+        rows_to_append = rows_df.values.tolist()
+        # An das Sheet anhängen; nach einem 5xx nur erneut senden, wenn die Zeilen nicht angekommen sind
+        ids = rows_df['ID'].tolist()
+        with_retry(worksheet.append_rows, rows_to_append, value_input_option='RAW',
+                   check_applied=lambda: True if sync_index.rows_appended(index, worksheet, ids) else None)
+        index.add(ids, new_df['Datum'].max().strftime('%Y-%m-%d'), keys[new])
+        index.save()
+        cache.invalidate('vertretungsplan')
+        logging.info('Neue Daten wurden erfolgreich in Google Sheets angehängt.')
+    else:
+        logging.info('Keine neuen Daten zum Hinzufügen.')
+
+    return new_df
+
+
+def get_vertretungsplan_store():
+    """
+    Liefert den konfigurierten lokalen Speicher oder None, wenn Google Sheets
+    das führende System ist.
+
+    Konfiguration in den Secrets (optional):
+        [storage]
+        backend = "parquet"          # oder "gsheet"
+        path = "data/vertretungsplan"
+        export_gsheet = true         # neue Daten zusätzlich in Google Sheets schreiben
+
+    Ohne Angabe wird nach Google Sheets exportiert, sofern dort ein Tabellenblatt
+    für die Vertretungsplan-Daten konfiguriert ist.
+    """
+    config = get_secrets().get("storage", {})
+    if config.get("backend", "parquet") != "parquet":
+        return None
+    # pyarrow.parquet nur laden, wenn der lokale Speicher auch genutzt wird
+    from storage import ParquetStore
+    return ParquetStore(config.get("path", "data/vertretungsplan"))
+
+
+def get_rollup_store(store):
+    """Ablage des Tageswürfels im Verzeichnis des lokalen Speichers."""
+    return DailyRollupStore(os.path.join(store.path, 'rollups'))
+
+
+def load_daily_rollup(df):
+    """
+    Liefert den Tageswürfel (Anzahl pro Datum, Klasse, Ausfall-Fach, Ausfall,
+    Selbststudium) zu den Vertretungsplan-Daten `df`.
+
+    Beim lokalen Speicher wird der beim Speichern fortgeschriebene Würfel gelesen,
+    solange er zur Versionsmarke von `df` passt; sonst wird er aus `df` gebildet.
+    """
+    version = cache.version_of(df)
+    store = get_vertretungsplan_store()
+    if store is None:
+        return cache.set_version(daily_rollup(df), version)
+
+    rollup_store = get_rollup_store(store)
+    cube = rollup_store.load(version)
+    if cube is None:
+        cube = daily_rollup(df)
+        if version == store.version():
+            rollup_store.save(cube, version)
+    return cache.set_version(cube, version)
+
+
+def load_vertretungsplan_data():
+    """
+    Lädt die Vertretungsplan-Daten aus dem konfigurierten Speicher.
+
+    Ist der lokale Speicher noch leer, wird er einmalig aus Google Sheets befüllt,
+    sofern dort ein Tabellenblatt konfiguriert ist; sonst bleibt er leer.
+    Hat ein anderer Prozess (z. B. `python -m vplan ingest` per cron) inzwischen in den
+    lokalen Speicher geschrieben, passt die Versionsmarke nicht mehr und der
+    Cache wird neu befüllt.
+    """
+    df = _load_vertretungsplan_data()
+    store = get_vertretungsplan_store()
+    if store is not None and cache.version_of(df) != store.version():
+        cache.invalidate('vertretungsplan')
+        df = _load_vertretungsplan_data()
+    return df
+
+
+def stored_days():
+    """Menge der Tage (datetime.date), zu denen Vertretungsplan-Daten gespeichert sind."""
+    store = get_vertretungsplan_store()
+    if store is not None and not store.is_empty():
+        return store.days()
+    df = load_vertretungsplan_data()
+    if df.empty:
+        return set()
+    return set(df['Datum'].dt.date)
+
+
+@cache.cached('vertretungsplan', ttl=3600)
+def _load_vertretungsplan_data():
+    store = get_vertretungsplan_store()
+    if store is None:
+        return load_vertretungsplan_data_from_gsheet()
+
+    if store.is_empty() and gsheet_source_configured():
+        logging.info('Lokaler Speicher ist leer, Erstbefüllung aus Google Sheets.')
+        df = load_vertretungsplan_data_from_gsheet()
+        if not df.empty:
+            store.append(df)
+    return cache.set_version(store.load(), store.version())
+
+
+def save_vertretungsplan_data(df):
+    """
+    Speichert neue Datensätze im konfigurierten Speicher und exportiert sie
+    optional nach Google Sheets.
+
+    Rückgabe:
+    - Die tatsächlich neu gespeicherten Datensätze.
+    """
+    store = get_vertretungsplan_store()
+    if store is None:
+        return save_to_gsheet(df)
+
+    old_version = store.version()
+    new_df = store.append(df)
+    if not new_df.empty:
+        # Tageswürfel fortschreiben statt ihn aus allen Datensätzen neu zu bilden
+        get_rollup_store(store).update(new_df, old_version, store.version())
+        cache.invalidate('vertretungsplan')
+    if get_secrets().get("storage", {}).get("export_gsheet", gsheet_source_configured()):
+        save_to_gsheet(df)
+    return new_df
+
+
+@cache.cached('vergleich', ttl=3600)
+def load_vergleich_for_schuljahr(schuljahr: str) -> pd.DataFrame:
+    """
+    Lädt das 'vergleich'-Tabellenblatt für ein bestimmtes Schuljahr als DataFrame.
+
+    Annahmen:
+    - Es existiert ein Tabellenblatt mit dem Namen "vergleich-<schuljahr>", z. B. "vergleich-2024/25".
+    - Das Tabellenblatt hat die Spalten: 
+      ID, Schuljahr, Jahr, KW, Klasse, Fach, Klassenstufe, Soll, Ist, Delta, Keine-Daten
+
+    Rückgabe:
+    - Ein DataFrame mit den entsprechenden Datentypen:
+      * Jahr, KW, Klassenstufe, Soll, Ist, Delta: int64 oder Int64
+      * Keine-Daten: bool
+      * Andere Spalten: str oder passend konvertiert
+    """
+
+    sheet_title = f"vergleich-{schuljahr}"
+
+    # Versuch, das entsprechende Tabellenblatt zu öffnen
+    worksheet = get_gsheet_connection().worksheet(
+        get_secrets()["connections"]["gsheets"]["vergleich-sollstunden"], sheet_title)
+    data = worksheet.get_all_records()
+
+    if data:
+        df = pd.DataFrame(data)
+    else:
+        # Kein Inhalt im Tabellenblatt
+        df = pd.DataFrame()
+
+    if not df.empty:
+        # Typkonvertierungen vornehmen
+        # Jahr, KW, Klassenstufe, Soll, Ist, Delta in numerisch
+        numeric_cols = ['Jahr', 'KW', 'Klassenstufe', 'Soll', 'Ist', 'Delta']
+        for col in numeric_cols:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
+
+        # Keine-Daten von 'True'/'False' in bool umwandeln
+        df['Keine-Daten'] = df['Keine-Daten'].astype(str).str.lower().map({'true': True, 'false': False})
+        df['Keine-Daten'] = df['Keine-Daten'].fillna(False).astype(bool)
+
+        # Andere Spalten (ID, Schuljahr, Klasse, Fach) bleiben Strings
+        # Falls notwendig: df['Fach'] = df['Fach'].astype(str) - aber durch get_all_records() sind sie i.d.R. Strings
+
+    return cache.set_version(df)
+
+def _load_vergleich_or_empty(schuljahr):
+    from gspread.exceptions import WorksheetNotFound
+    try:
+        return load_vergleich_for_schuljahr(schuljahr)
+    except WorksheetNotFound:
+        logging.warning(f"Tabellenblatt vergleich-{schuljahr} fehlt, Schuljahr wird übersprungen.")
+        return pd.DataFrame()
+
+
+def load_vergleich_for_schuljahre(schuljahre) -> pd.DataFrame:
+    """
+    Lädt die 'vergleich'-Tabellenblätter mehrerer Schuljahre gleichzeitig und hängt sie aneinander.
+
+    Jedes Blatt wird in einer Kopie des aktuellen contextvars-Kontexts geladen, sodass
+    die Zähler für API-Aufrufe (gsheet) und gesendete Daten (ui) weiterhin dem
+    aktuellen Seitendurchlauf zugerechnet werden. Fehlt das Blatt eines Schuljahres,
+    wird es ausgelassen.
+
+    Rückgabe:
+    - Ein DataFrame wie load_vergleich_for_schuljahr, mit Versionsmarke aus denen der Blätter
+    """
+    schuljahre = list(schuljahre)
+    if not schuljahre:
+        return cache.set_version(pd.DataFrame())
+    workers = max(1, min(MAX_SHEET_WORKERS, len(schuljahre)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, _load_vergleich_or_empty, schuljahr)
+                   for schuljahr in schuljahre]
+        frames = [future.result() for future in futures]
+
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return cache.set_version(pd.DataFrame())
+    df = pd.concat(frames, ignore_index=True)
+    return cache.set_version(df, '+'.join(cache.version_of(frame) for frame in frames))
+
+
+@cache.cached('schuljahr', ttl=3600)
+def load_schuljahre() -> pd.DataFrame:
+    """
+    Lädt das Tabellenblatt 'schuljahr' mit den Spalten
+    Schuljahr, Klassen, Jahr-Start, KW-Start, Jahr-Ende, KW-Ende.
+    """
+    worksheet = get_gsheet_connection().worksheet(
+        get_secrets()["connections"]["gsheets"]["vergleich-sollstunden"], "schuljahr")
+    return pd.DataFrame(worksheet.get_all_records())
+
+
+def save_vergleich(schuljahr, rows):
+    """Schreibt die Vergleichszeilen eines Schuljahres in das Tabellenblatt 'vergleich-<schuljahr>'."""
+    conn = get_gsheet_connection()
+    sheet_url = get_secrets()["connections"]["gsheets"]["vergleich-sollstunden"]
+    # Alle Werte in Strings umwandeln und blockweise über ein Staging-Blatt schreiben
+    rows_str = rows[VERGLEICH_HEADER].astype(str).values.tolist()
+    write_worksheet(conn, sheet_url, f"vergleich-{schuljahr}", VERGLEICH_HEADER, rows_str)
+    cache.invalidate('vergleich')
+
+
+def init_vergleich_tables():
+    """
+    Erzeugt für jedes Schuljahr aus dem Tabellenblatt 'schuljahr' die Vergleichszeilen
+    (alle Wochen × Klassen × Fächer mit Soll aus 'soll-<schuljahr>') und schreibt sie
+    in ein eigenes Tabellenblatt 'vergleich-<schuljahr>'.
+
+    Rückgabe:
+    - Dict {schuljahr: Anzahl der geschriebenen Zeilen}
+    """
+    conn = get_gsheet_connection()
+    sheet_url = get_secrets()["connections"]["gsheets"]["vergleich-sollstunden"]
+
+    # Tabellenblatt "schuljahr" frisch laden
+    cache.invalidate('schuljahr')
+    df_schuljahr = load_schuljahre()
+
+    schuljahr_data = {}  # key: schuljahr, value: Liste von DataFrames
+
+    for row in df_schuljahr.to_dict('records'):
+        schuljahr = str(row['Schuljahr'])
+        klassen_str = str(row['Klassen'])
+        klassen_liste = [k.strip() for k in klassen_str.split(';') if k.strip()]
+
+        # Name des Soll-Blatts bestimmen
+        soll_sheet_name = "soll-" + schuljahr
+        worksheet_soll = conn.worksheet(sheet_url, soll_sheet_name)
+        df_soll = pd.DataFrame(worksheet_soll.get_all_records())
+
+        # Vergleichszeilen für alle Wochen × Klassen × Fächer in einem Durchgang erzeugen
+        frame = build_vergleich_frame(
+            schuljahr,
+            int(row['Jahr-Start']), int(row['KW-Start']),
+            int(row['Jahr-Ende']), int(row['KW-Ende']),
+            klassen_liste, df_soll
+        )
+        schuljahr_data.setdefault(schuljahr, []).append(frame)
+
+    # Jetzt schreiben wir für jedes Schuljahr ein eigenes Tabellenblatt
+    written = {}
+    for sj, frames in schuljahr_data.items():
+        rows = pd.concat(frames, ignore_index=True)
+        if rows.empty:
+            logging.info(f"Keine Zeilen für Schuljahr {sj} generiert, vermutlich Soll=0 für alle Fächer?")
+        save_vergleich(sj, rows)
+        written[sj] = len(rows)
+
+    logging.info("Vergleich-Tabellen pro Schuljahr erfolgreich initialisiert!")
+    return written
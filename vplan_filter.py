@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+
+from ids import first_occurrences, id_keys
+
+# Anzeigename für Datensätze ohne Ausfall-Fach
+KEIN_FACH = 'Kein Fach'
+# Anzeigename für Datensätze ohne Klassenstufe (z. B. Klub, DAZ)
+KEINE_KLASSENSTUFE = 'Keine Klassenstufe'
+
+
+def _ausfall_fach_label(fach):
+    if pd.isna(fach) or str(fach).strip() == '':
+        return KEIN_FACH
+    return str(fach).strip()
+
+
+class _Codes:
+    """
+    Spalte als Codes auf ihre eindeutigen Werte (`labels`).
+
+    Eine Auswahl wird einmal auf die wenigen Labels abgebildet (Lookup-Tabelle);
+    die Maske für einen Zeilenbereich ist dann ein einziger Indexzugriff.
+    Fehlende Werte erhalten das Label `missing` (z. B. 'Keine Klassenstufe'), da
+    Streamlit-Widgets kein <NA> als Option vertragen.
+    """
+
+    def __init__(self, values, label=None, missing=None):
+        codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        uniques = pd.Index(uniques).tolist()
+        labels = [label(value) for value in uniques] if label else uniques
+        self.missing = missing
+        if missing is not None:
+            labels = [missing if pd.isna(value) else value for value in labels]
+        # Mehrere Werte können auf dasselbe Label fallen (z. B. '' und NaN -> 'Kein Fach')
+        label_codes, self.labels = pd.factorize(pd.Series(labels, dtype=object), use_na_sentinel=False)
+        self.codes = label_codes.take(codes).astype(np.int32)
+
+    def options(self):
+        """Sortierte Labels; das Label für fehlende Werte (bzw. <NA>) steht am Ende."""
+        values = [value for value in self.labels if not pd.isna(value) and value != self.missing]
+        options = sorted(values)
+        if len(values) < len(self.labels):
+            options.append(pd.NA if self.missing is None else self.missing)
+        return options
+
+    def allowed(self, selected):
+        selected = list(selected)
+        values = [value for value in selected if not pd.isna(value)]
+        labels = pd.Index(self.labels, dtype=object)
+        # Fehlende Werte (NaN/<NA>) werden über isna statt über Gleichheit ausgewählt
+        return labels.isin(values) | (labels.isna() & (len(values) < len(selected)))
+
+
+class VertretungsplanFilter:
+    """
+    Filter-Engine für die Vertretungsplan-Daten.
+
+    Die Daten werden einmal nach 'Datum' sortiert und Klasse, Klassenstufe und
+    Ausfall-Fach als Codes vorberechnet. Ein Filteraufruf grenzt den Datumsbereich
+    per `searchsorted` ein und prüft die übrigen Kriterien nur innerhalb dieses
+    Bereichs; ist bei einem Kriterium alles ausgewählt, entfällt die Prüfung.
+
+    Dieselbe Engine filtert auch den Tageswürfel (rollups.daily_rollup), der
+    dieselben Filterspalten besitzt.
+    """
+
+    def __init__(self, df):
+        # Duplikate entfernen (Würfel aus rollups.py haben keine ID, sondern eine Spalte 'Anzahl')
+        if 'ID' in df and len(df):
+            df = df[first_occurrences(id_keys(df['ID']))]
+        order = np.argsort(df['Datum'].to_numpy(), kind='stable')
+        self.df = df.iloc[order]
+
+        self._datum = self.df['Datum'].to_numpy()
+        self._klasse = _Codes(self.df['Klasse'])
+        self._klassenstufe = _Codes(self.df['Klassenstufe'], missing=KEINE_KLASSENSTUFE)
+        self._ausfall_fach = _Codes(self.df['Ausfall-Fach'], label=_ausfall_fach_label)
+        self._ausfall = self.df['Ausfall'].to_numpy(dtype=bool)
+        self._selbststudium = self.df['Selbststudium'].to_numpy(dtype=bool)
+
+    def __len__(self):
+        return len(self.df)
+
+    @property
+    def min_date(self):
+        return self.df['Datum'].iloc[0].date()
+
+    @property
+    def max_date(self):
+        return self.df['Datum'].iloc[-1].date()
+
+    def klassen(self):
+        return self._klasse.options()
+
+    def klassenstufen(self):
+        return self._klassenstufe.options()
+
+    def ausfall_faecher(self):
+        return self._ausfall_fach.options()
+
+    def filter(self, start_date, end_date, selected_klassen, selected_ausfall, selected_selbststudium,
+               selected_ausfall_fach, selected_klassenstufen):
+        """
+        Liefert die Datensätze im Zeitraum [start_date, end_date], die allen Kriterien entsprechen.
+
+        Parameter wie bisher in filter_data: Ausfall/Selbststudium als 'Alle', 'Ja' oder 'Nein',
+        eine leere Ausfall-Fach-Auswahl filtert nicht.
+        """
+        lo = np.searchsorted(self._datum, np.datetime64(pd.Timestamp(start_date)), side='left')
+        hi = np.searchsorted(self._datum, np.datetime64(pd.Timestamp(end_date)), side='right')
+        if hi <= lo:
+            return self.df.iloc[0:0]
+
+        mask = np.ones(hi - lo, dtype=bool)
+        criteria = [(self._klasse, selected_klassen), (self._klassenstufe, selected_klassenstufen)]
+        if selected_ausfall_fach:
+            criteria.append((self._ausfall_fach, selected_ausfall_fach))
+        for codes, selected in criteria:
+            allowed = codes.allowed(selected)
+            if not allowed.all():
+                mask &= allowed[codes.codes[lo:hi]]
+
+        if selected_ausfall != 'Alle':
+            mask &= self._ausfall[lo:hi] == (selected_ausfall == 'Ja')
+        if selected_selbststudium != 'Alle':
+            mask &= self._selbststudium[lo:hi] == (selected_selbststudium == 'Ja')
+
+        result = self.df.iloc[lo:hi]
+        return result if mask.all() else result[mask]
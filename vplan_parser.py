@@ -0,0 +1,255 @@
+import io
+import logging
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+
+from german_date import parse_german_date
+from ids import make_ids
+from klassen import klassenstufe_series
+
+# Spaltenreihenfolge der geparsten Vertretungsplan-Daten
+COLUMNS = ['ID', 'Datei', 'Datum', 'Klasse', 'Stunde', 'Fach', 'Lehrer', 'Raum', 'Info',
+           'Ausfall', 'Selbststudium', 'Ausfall-Fach', 'Ausfall-Lehrer', 'Klassenstufe']
+
+# Anzahl Datensätze pro Batch im Streaming-Modus
+BATCH_SIZE = 10000
+
+
+def _split_ausfall_info(info):
+    """Extrahiert (Ausfall-Fach, Ausfall-Lehrer) aus einer Info wie 'MA Mül fällt aus'."""
+    # 'fällt aus' entfernen und in Wörter aufteilen
+    words = info.replace('fällt aus', '').split()
+    if not words:
+        return '', ''
+    return words[0], ' '.join(words[1:])
+
+
+def _parse_titel_datum(titel):
+    # Datum aus 'titel' extrahieren und in ein Datum-Objekt umwandeln
+    # Beispiel: "Montag, 25. November 2024"
+    date_part = titel.strip().split(',')[1].strip()
+    return parse_german_date(date_part)
+
+
+class _AktionColumns:
+    """
+    Sammelt die Spalten der Datensätze aus <aktion>-Elementen.
+
+    Die Felder einer <aktion> werden einmal gelesen und später per Wiederholung
+    auf ihre Klassen × Stunden verteilt.
+    """
+
+    def __init__(self):
+        # Spalten auf Ebene der <aktion> (werden später wiederholt)
+        self.repeats = []
+        self.faecher, self.lehrer, self.raeume, self.infos = [], [], [], []
+        self.ausfaelle, self.selbststudien = [], []
+        self.ausfall_faecher, self.ausfall_lehrer = [], []
+        # Spalten auf Ebene der einzelnen Datensätze
+        self.klassen, self.stunden = [], []
+
+    def __len__(self):
+        return len(self.klassen)
+
+    def add(self, aktion):
+        felder = {child.tag: child.text or '' for child in aktion}
+        klassen_liste = parse_klasse(felder.get('klasse', ''))
+        stunden_liste = parse_stunde(felder.get('stunde', ''))
+        fach = felder.get('fach', '')
+        info = felder.get('info', '')
+
+        # Ausfall prüfen
+        ausfall = fach == '---'
+
+        # Ausfall-Fach und Ausfall-Lehrer extrahieren
+        if ausfall and 'fällt aus' in info:
+            ausfall_fach, ausfall_lehrer = _split_ausfall_info(info)
+        else:
+            ausfall_fach, ausfall_lehrer = '', ''
+
+        # Für jede Klasse und jede Stunde einen Datensatz
+        self.repeats.append(len(klassen_liste) * len(stunden_liste))
+        for klasse in klassen_liste:
+            self.klassen.extend([klasse] * len(stunden_liste))
+            self.stunden.extend(stunden_liste)
+        self.faecher.append(fach)
+        self.lehrer.append(felder.get('lehrer', ''))
+        self.raeume.append(felder.get('raum', ''))
+        self.infos.append(info)
+        self.ausfaelle.append(ausfall)
+        # Selbststudium prüfen (Groß-/Kleinschreibung ignorieren)
+        self.selbststudien.append('selbst.' in info.lower())
+        self.ausfall_faecher.append(ausfall_fach)
+        self.ausfall_lehrer.append(ausfall_lehrer)
+
+    def to_frame(self, datei, datum):
+        if not self.klassen:
+            return pd.DataFrame(columns=COLUMNS)
+
+        repeats = np.asarray(self.repeats)
+
+        def expand(values, dtype=object):
+            return np.repeat(np.asarray(values, dtype=dtype), repeats)
+
+        fach_col = expand(self.faecher)
+        lehrer_col = expand(self.lehrer)
+        raum_col = expand(self.raeume)
+        info_col = expand(self.infos)
+
+        # Generiere eindeutige IDs (batchweise, kompatibel zu den gespeicherten MD5-IDs)
+        datum_prefix = [datum.strftime('%Y%m%d')] * len(self.klassen)
+        ids = make_ids([datum_prefix, self.klassen, self.stunden, fach_col, lehrer_col, raum_col, info_col])
+
+        # Textspalten bleiben object: die Kategorien aus schema.py werden einmal für den
+        # ganzen gespeicherten Bestand gebildet (ParquetStore.load), nicht pro Datei
+        df = pd.DataFrame({
+            'ID': ids,
+            'Datei': datei,
+            'Datum': pd.Timestamp(datum).as_unit('ns'),
+            'Klasse': self.klassen,
+            'Stunde': pd.to_numeric(pd.Series(self.stunden), errors='coerce').astype('Int8'),
+            'Fach': fach_col,
+            'Lehrer': lehrer_col,
+            'Raum': raum_col,
+            'Info': info_col,
+            'Ausfall': expand(self.ausfaelle, dtype=bool),
+            'Selbststudium': expand(self.selbststudien, dtype=bool),
+            'Ausfall-Fach': expand(self.ausfall_faecher),
+            'Ausfall-Lehrer': expand(self.ausfall_lehrer),
+        })
+
+        # **Klassenstufe extrahieren** (einmal pro eindeutiger Klasse)
+        df['Klassenstufe'] = klassenstufe_series(df['Klasse']).astype('Int8')
+        return df
+
+
+# Funktion zum Parsen des XML und Erstellen des DataFrames
+def parse_xml(xml_content):
+    """Parst eine VplanKl-XML-Datei in einen DataFrame mit einer Zeile pro Klasse und Stunde."""
+    if xml_content is None:
+        return pd.DataFrame()  # Leeren DataFrame zurückgeben
+
+    # XML-Daten parsen
+    root = ET.fromstring(xml_content)
+
+    # Informationen aus dem <kopf>-Element extrahieren
+    kopf = root.find('kopf')
+    datei = kopf.find('datei').text
+    datum = _parse_titel_datum(kopf.find('titel').text)
+
+    # Informationen aus dem <haupt>-Element extrahieren
+    columns = _AktionColumns()
+    for aktion in root.find('haupt').iterfind('aktion'):
+        columns.add(aktion)
+    return columns.to_frame(datei, datum)
+
+
+def iter_parse_xml(source, batch_size=BATCH_SIZE):
+    """
+    Parst eine VplanKl-XML-Datei im Streaming-Modus mit `iterparse`.
+
+    Verarbeitete <aktion>-Elemente werden sofort wieder freigegeben, sodass nie
+    der ganze Baum im Speicher liegt.
+
+    Parameter:
+    - source: XML als bytes, Dateipfad oder dateiähnliches Objekt (None wird übersprungen)
+    - batch_size: ungefähre Anzahl Datensätze pro Batch
+
+    Rückgabe:
+    - Generator von DataFrames mit denselben Spalten wie parse_xml
+    """
+    if source is None:
+        return
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    datei = datum = haupt = None
+    columns = _AktionColumns()
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if elem.tag == 'haupt':
+                haupt = elem
+            continue
+        if elem.tag == 'kopf':
+            datei = elem.findtext('datei')
+            datum = _parse_titel_datum(elem.findtext('titel'))
+        elif elem.tag == 'aktion':
+            columns.add(elem)
+            # Verarbeitete Elemente freigeben
+            if haupt is not None:
+                haupt.clear()
+            else:
+                elem.clear()
+            if len(columns) >= batch_size:
+                yield columns.to_frame(datei, datum)
+                columns = _AktionColumns()
+    if len(columns):
+        yield columns.to_frame(datei, datum)
+
+
+def iter_parse_many(xml_contents, batch_size=BATCH_SIZE):
+    """
+    Parst mehrere XML-Dateien (z. B. eines Backfills) im Streaming-Modus und fasst
+    die Datensätze tagesübergreifend zu Batches von etwa `batch_size` Zeilen zusammen.
+    """
+    pending, pending_rows = [], 0
+    for xml_content in xml_contents:
+        for batch in iter_parse_xml(xml_content, batch_size):
+            pending.append(batch)
+            pending_rows += len(batch)
+            if pending_rows >= batch_size:
+                yield pd.concat(pending, ignore_index=True)
+                pending, pending_rows = [], 0
+    if pending:
+        yield pd.concat(pending, ignore_index=True)
+
+
+# Funktion zum Parsen des 'klasse'-Feldes
+def parse_klasse(klasse_str):
+    classes = []
+    klasse_str = klasse_str.replace(' ', '')  # Leerzeichen entfernen
+    parts = klasse_str.split(',')
+    for part in parts:
+        if '-' in part:
+            start, end = part.split('-')
+            start_splits = start.split('/')
+            end_splits = end.split('/')
+            if len(start_splits) == 2 and len(end_splits) == 2:
+                base_start, section_start = start_splits
+                base_end, section_end = end_splits
+                if base_start != base_end:
+                    logging.warning(f"Unterschiedliche Basis in Bereich {part}. Bereich wird übersprungen.")
+                    continue
+                else:
+                    base = base_start
+                    section_start = int(section_start)
+                    section_end = int(section_end)
+                    for section in range(section_start, section_end + 1):
+                        classes.append(f"{base}/{section}")
+            else:
+                logging.warning(f"Unerwartetes Format in Klasse: {part}. Bereich wird übersprungen.")
+                continue
+        else:
+            classes.append(part)
+    return classes
+
+
+
+
+# Funktion zum Parsen des 'stunde'-Feldes
+def parse_stunde(stunde_str):
+    stunden = []
+    stunde_str = stunde_str.replace(' ', '')  # Leerzeichen entfernen
+    parts = stunde_str.split(',')
+    for part in parts:
+        if '-' in part:
+            start, end = part.split('-')
+            start = int(start)
+            end = int(end)
+            for s in range(start, end + 1):
+                stunden.append(str(s))
+        else:
+            stunden.append(part)
+    return stunden
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import time
+
+from atomic import atomic_path
+
+# Verzeichnis des lokalen Caches (per Umgebungsvariable überschreibbar)
+CACHE_DIR = os.environ.get('VPLAN_CACHE_DIR', os.path.join('.cache', 'vplan'))
+# Wie lange ein 404 (Wochenende, Ferien) als "nicht vorhanden" gilt, in Sekunden
+NOT_FOUND_TTL = 12 * 3600
+
+
+def _objects_dir():
+    return os.path.join(CACHE_DIR, 'objects')
+
+
+def _index_path(datum_str):
+    return os.path.join(CACHE_DIR, 'index', f'{datum_str}.json')
+
+
+def _write_atomic(path, data):
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+
+
+def lookup(datum_str):
+    """Liefert den Index-Eintrag für ein Datum oder None, falls nichts gecacht ist."""
+    try:
+        with open(_index_path(datum_str), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_known_missing(entry):
+    """True, wenn für das Datum ein noch gültiger 404-Eintrag existiert."""
+    return (
+        entry is not None
+        and entry.get('status') == 'missing'
+        and time.time() - entry.get('checked_at', 0) < NOT_FOUND_TTL
+    )
+
+
+def conditional_headers(entry):
+    """Header für einen bedingten GET (If-None-Match / If-Modified-Since)."""
+    headers = {}
+    if entry is None or entry.get('status') != 'ok':
+        return headers
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def read_content(entry):
+    """Liest das gecachte XML zu einem Index-Eintrag, None falls nicht vorhanden."""
+    if entry is None or entry.get('status') != 'ok':
+        return None
+    try:
+        with open(os.path.join(_objects_dir(), f"{entry['sha256']}.xml"), 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _processed_sha256(entry):
+    # Einträge aus der Zeit vor 'processed_sha256' gelten als verarbeitet
+    if entry is None or entry.get('status') != 'ok':
+        return None
+    return entry.get('processed_sha256', entry.get('sha256'))
+
+
+def is_processed(entry):
+    """True, wenn der gecachte Inhalt bereits geparst und gespeichert wurde (siehe mark_processed)."""
+    return entry is not None and entry.get('status') == 'ok' and _processed_sha256(entry) == entry['sha256']
+
+
+def store(datum_str, content, etag=None, last_modified=None):
+    """
+    Speichert das XML inhaltsadressiert und aktualisiert den Index für das Datum.
+
+    Als verarbeitet gilt der neue Inhalt erst nach mark_processed, also wenn die
+    Datensätze tatsächlich gespeichert sind.
+
+    Rückgabe:
+    - True, wenn der Inhalt noch nicht verarbeitet wurde (neu oder geändert).
+    """
+    sha256 = hashlib.sha256(content).hexdigest()
+    object_path = os.path.join(_objects_dir(), f'{sha256}.xml')
+    if not os.path.exists(object_path):
+        _write_atomic(object_path, content)
+
+    entry = {
+        'status': 'ok',
+        'sha256': sha256,
+        'processed_sha256': _processed_sha256(lookup(datum_str)),
+        'etag': etag,
+        'last_modified': last_modified,
+        'checked_at': time.time(),
+    }
+    _write_atomic(_index_path(datum_str), json.dumps(entry).encode('utf-8'))
+    return not is_processed(entry)
+
+
+def mark_processed(datum_str, content):
+    """Vermerkt, dass die Datensätze aus `content` für das Datum gespeichert sind."""
+    entry = lookup(datum_str)
+    if entry is None or entry.get('status') != 'ok':
+        return
+    sha256 = hashlib.sha256(content).hexdigest()
+    if entry['sha256'] == sha256 and entry.get('processed_sha256') != sha256:
+        entry['processed_sha256'] = sha256
+        _write_atomic(_index_path(datum_str), json.dumps(entry).encode('utf-8'))
+
+
+def unprocessed_days():
+    """Tage (YYYYMMDD), deren gecachter Inhalt abgerufen, aber noch nicht gespeichert wurde."""
+    try:
+        names = os.listdir(os.path.join(CACHE_DIR, 'index'))
+    except OSError:
+        return []
+    days = []
+    for name in sorted(names, reverse=True):
+        if name.endswith('.json'):
+            datum_str = name[:-len('.json')]
+            entry = lookup(datum_str)
+            if entry is not None and entry.get('status') == 'ok' and not is_processed(entry):
+                days.append(datum_str)
+    return days
+
+
+def touch(datum_str, entry):
+    """Vermerkt eine erfolgreiche Revalidierung (304) für das Datum."""
+    entry = dict(entry, checked_at=time.time())
+    _write_atomic(_index_path(datum_str), json.dumps(entry).encode('utf-8'))
+
+
+def store_not_found(datum_str):
+    """Merkt sich einen 404 für das Datum (Negativ-Cache mit TTL)."""
+    entry = {'status': 'missing', 'checked_at': time.time()}
+    _write_atomic(_index_path(datum_str), json.dumps(entry).encode('utf-8'))